@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Check the import cost of get_geo_attrs.py against a budget, using
+`python -X importtime`.
+
+The module is imported several times in fresh interpreters and the median
+cumulative import time is compared to the budget. Heavy dependencies that
+should only load on the code paths needing them (numpy, netCDF4,
+compliance_checker) must not be imported at all. Exits non-zero if either
+check fails.
+
+usage: bench_startup.py [-h] [--module MODULE] [--budget-ms BUDGET_MS]
+                        [--runs RUNS] [--forbid FORBID] [--top TOP]
+
+optional arguments:
+  -h, --help            show this help message and exit
+  --module MODULE       module to import; default get_geo_attrs
+  --budget-ms BUDGET_MS
+                        maximum median cumulative import time; default 50
+  --runs RUNS           number of interpreters to start; default 5
+  --forbid FORBID       comma-separated modules which must not be imported;
+                        default numpy,netCDF4,compliance_checker
+  --top TOP             number of slowest imports to list; default 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Args:
+        stderr (str): interpreter stderr
+
+    Returns:
+        list of (module name, self us, cumulative us)
+    """
+
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        out.append((name.strip(), int(self_us), int(cumulative_us)))
+    return out
+
+def time_import(module, cwd):
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module (str): module name
+        cwd (str)   : directory to run from
+
+    Returns:
+        list of (module name, self us, cumulative us), see parse_importtime()
+    """
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        cwd=cwd,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    )
+    return parse_importtime(proc.stderr)
+
+def main(module, budget_ms, runs, forbid, top):
+    """
+    Run the benchmark and print a report.
+
+    Returns:
+        int, exit status
+    """
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    # the first run also writes the .pyc
+    time_import(module, cwd)
+    timings = [time_import(module, cwd) for _ in range(runs)]
+
+    totals = [dict((name, cum) for name, _, cum in t)[module] / 1000 for t in timings]
+    median = statistics.median(totals)
+    print("{} import: median {:.1f} ms over {} runs (budget {:.1f} ms)".format(module, median, runs, budget_ms))
+
+    print("slowest imports (self time, last run):")
+    for name, self_us, cumulative_us in sorted(timings[-1], key=lambda t: t[1], reverse=True)[:top]:
+        print("  {:>8.1f} ms  {:>8.1f} ms cumulative  {}".format(self_us / 1000, cumulative_us / 1000, name))
+
+    status = 0
+    imported = set(name.split(".")[0] for name, _, _ in timings[-1])
+    for name in forbid:
+        if name in imported:
+            print("FAIL: {} is imported at startup".format(name))
+            status = 1
+    if median > budget_ms:
+        print("FAIL: over budget by {:.1f} ms".format(median - budget_ms))
+        status = 1
+    return status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", help="module to import; default get_geo_attrs", default="get_geo_attrs")
+    parser.add_argument("--budget-ms", help="maximum median cumulative import time; default 50", type=float, default=50.0)
+    parser.add_argument("--runs", help="number of interpreters to start; default 5", type=int, default=5)
+    parser.add_argument("--forbid", help="comma-separated modules which must not be imported; default numpy,netCDF4,compliance_checker", default="numpy,netCDF4,compliance_checker")
+    parser.add_argument("--top", help="number of slowest imports to list; default 10", type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(main(args.module, args.budget_ms, args.runs, [f for f in args.forbid.split(",") if f], args.top))
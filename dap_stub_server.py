@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Serve local NetCDF files over a minimal subset of DAP2, so OPeNDAP code
+paths (e.g. get_geo_attrs.py) can be exercised offline.
+
+Only numeric variables are served, as plain arrays (no Grids or
+Sequences), and only hyperslab projections are understood in constraint
+expressions. Every request is logged to stderr with a running count, so
+the number of data requests a client makes can be checked.
+
+usage: dap_stub_server.py [-h] [--port PORT] root
+
+positional arguments:
+  root         directory of NetCDF files to serve
+
+optional arguments:
+  -h, --help   show this help message and exit
+  --port PORT  port to listen on; default 8000
+
+Files are then available as http://localhost:<port>/<path relative to root>.
+"""
+
+import argparse
+import http.server
+import itertools
+import netCDF4
+import numpy as np
+import os
+import re
+import sys
+import urllib.parse
+
+# numpy dtype -> (DAP2 type, XDR dtype); DAP2 has no 8-bit signed or
+# 64-bit integers, and sends 16-bit integers as 32-bit
+DAP_TYPES = {
+    "uint8": ("Byte", ">u1"),
+    "int8": ("Int16", ">i4"),
+    "int16": ("Int16", ">i4"),
+    "uint16": ("UInt16", ">u4"),
+    "int32": ("Int32", ">i4"),
+    "uint32": ("UInt32", ">u4"),
+    "float32": ("Float32", ">f4"),
+    "float64": ("Float64", ">f8"),
+}
+
+REQUEST_COUNT = itertools.count(1)
+
+def parse_constraint(ce):
+    """
+    Parse a DAP2 constraint expression made of hyperslab projections.
+
+    Args:
+        ce (str): e.g. "lat[0:1:9],lon"
+
+    Returns:
+        list of (variable name, list of (start, stride, stop) or None)
+    """
+
+    out = []
+    for projection in filter(None, urllib.parse.unquote(ce).split("&")[0].split(",")):
+        name = projection.split("[")[0]
+        hyperslabs = []
+        for hs in re.findall(r"\[([^\]]*)\]", projection):
+            parts = [int(p) for p in hs.split(":")]
+            if len(parts) == 1:
+                parts = [parts[0], 1, parts[0]]
+            elif len(parts) == 2:
+                parts = [parts[0], 1, parts[1]]
+            hyperslabs.append(tuple(parts))
+        out.append((name, hyperslabs or None))
+    return out
+
+def served_variables(nc):
+    return [v for v in nc.variables.values() if v.dtype is not str and v.dtype.name in DAP_TYPES]
+
+def declare(var, shape):
+    dims = "".join("[{} = {}]".format(d, n) for d, n in zip(var.dimensions, shape))
+    return "    {} {}{};".format(DAP_TYPES[var.dtype.name][0], var.name, dims)
+
+def render_dds(nc, name, projections):
+    lines = ["Dataset {"]
+    for var, index in projections:
+        lines.append(declare(var, var[index].shape if index else var.shape))
+    lines.append("}} {};".format(name))
+    return "\n".join(lines) + "\n"
+
+def render_attribute(name, value):
+    if isinstance(value, str):
+        return '        String {} "{}";'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+
+    value = np.atleast_1d(value)
+    dap_type = DAP_TYPES.get(value.dtype.name, ("Float64", None))[0]
+    return "        {} {} {};".format(dap_type, name, ", ".join(repr(v.item()) for v in value))
+
+def render_das(nc):
+    lines = ["Attributes {"]
+    for var in served_variables(nc):
+        lines.append("    {} {{".format(var.name))
+        lines.extend(render_attribute(k, var.getncattr(k)) for k in var.ncattrs())
+        lines.append("    }")
+    lines.append("    NC_GLOBAL {")
+    lines.extend(render_attribute(k, nc.getncattr(k)) for k in nc.ncattrs())
+    lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def encode_array(data, xdr_dtype):
+    """
+    XDR-encode an array as DAP2 sends it: the length twice, then the values,
+    padded to a multiple of four bytes for Bytes.
+    """
+
+    n = np.array([data.size, data.size], ">u4").tobytes()
+    if xdr_dtype == ">u1":
+        payload = data.astype(xdr_dtype).tobytes()
+        return n + payload + b"\0" * (-len(payload) % 4)
+    return n + data.astype(xdr_dtype).tobytes()
+
+class DapStubHandler(http.server.BaseHTTPRequestHandler):
+
+    root = "."
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write("[{}] {}\n".format(next(REQUEST_COUNT), fmt % args))
+
+    def send(self, body, description, content_type="text/plain"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Description", description)
+        self.send_header("XDODS-Server", "dods/3.2")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        base, ext = os.path.splitext(urllib.parse.unquote(url.path))
+        fpath = os.path.join(self.root, base.lstrip("/"))
+        if ext not in (".dds", ".das", ".dods") or not os.path.isfile(fpath):
+            self.send_error(404)
+            return
+
+        with netCDF4.Dataset(fpath) as nc:
+            nc.set_auto_maskandscale(False)
+            served = {v.name: v for v in served_variables(nc)}
+            wanted = parse_constraint(url.query) or [(name, None) for name in served]
+            try:
+                projections = [
+                    (served[name], tuple(slice(a, c + 1, b) for a, b, c in hs) if hs else None)
+                    for name, hs in wanted
+                ]
+            except KeyError:
+                self.send_error(404)
+                return
+
+            name = os.path.basename(fpath)
+            if ext == ".das":
+                self.send(render_das(nc).encode("utf-8"), "dods-das")
+            elif ext == ".dds":
+                self.send(render_dds(nc, name, projections).encode("utf-8"), "dods-dds")
+            else:
+                body = [render_dds(nc, name, projections).encode("utf-8"), b"Data:\n"]
+                for var, index in projections:
+                    data = np.asarray(var[index] if index else var[...])
+                    body.append(encode_array(data.ravel(), DAP_TYPES[var.dtype.name][1]))
+                self.send(b"".join(body), "dods-data", "application/octet-stream")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root", help="directory of NetCDF files to serve")
+    parser.add_argument("--port", help="port to listen on; default 8000", type=int, default=8000)
+    args = parser.parse_args()
+
+    DapStubHandler.root = args.root
+    server = http.server.ThreadingHTTPServer(("localhost", args.port), DapStubHandler)
+    print("serving {} on http://localhost:{}/".format(args.root, args.port), file=sys.stderr)
+    server.serve_forever()
@@ -4,8 +4,15 @@ ERD? Do you love writing out each variable in XML files?
 Well have I got a script for you.
 """
 
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
 import pathlib
+import sqlite3
 import netCDF4 as nc4
+import netcdf_header
 import typing
 import numpy as np
 import string
@@ -45,6 +52,15 @@ ERDDAP_DATAVARIABLE_STR = """
 
 ERDDAP_ATT_TAG = '    <att name="{name}" type="{type}">{value}</att>'
 
+# files rendered per task handed to a worker; a couple of tasks per
+# worker are in flight at once, so this bounds the rendered blocks held
+# in memory whatever the number of files
+FILES_PER_TASK = 16
+
+# bump when the rendering of a <dataset> block changes, so cached blocks
+# are rendered again
+FRAGMENT_CACHE_VERSION = 1
+
 def create_att_tags(atts: typing.Dict[str, str]):
     return "\n".join(
         s for s in map(
@@ -199,6 +215,346 @@ def create_cdm_altitude_proxy_tag(proxy_var: typing.Optional) -> str:
     else:
         return ""
 
+def get_dataset_id(ncfile: pathlib.Path) -> str:
+    """
+    Return the datasetID for a NetCDF file: its name up to ".nc".
+    """
+
+    return ncfile.name.split(".nc")[0]
+
+def render_dataset(
+    ncfile: pathlib.Path,
+    fragment: str,
+    settings: dict) -> typing.Tuple[str, typing.Optional[str], typing.Optional[str]]:
+    """
+    Fill in the <dataset> fragment for one NetCDF file, creating
+    <dataVariable> blocks for each of its variables.
+
+    This runs in a worker process, so any error is returned rather than
+    raised and only costs the one file. Only metadata is needed, so
+    classic format files just have their header read, see netcdf_header;
+    others are opened with netCDF4 and closed as soon as the block is
+    rendered: left to the garbage collector, the reference cycles between
+    a netCDF4.Dataset and its variables keep file handles and HDF5
+    metadata caches piling up across files.
+
+    Parameters
+    ----------
+    ncfile: path to the NetCDF file
+    fragment: user-defined <dataset></dataset> block
+    settings: configuration values used in the block, see main()
+
+    Returns
+    -------
+    (dataset_id, rendered block or None, error message or None)
+    """
+
+    _fname = ncfile.name
+    dataset_id = get_dataset_id(ncfile)
+    try:
+        with netcdf_header.open_dataset(ncfile) as nc:
+            cdm_types_vars_dict = create_cdm_variables_dict(
+                settings["cdm_data_type_dims"], nc, settings["user_config_variable_attrs"]
+            )
+            fields_dict = {
+                "dataset_id": dataset_id,
+                "filename": _fname,
+                "dataVariables": dump_variables_as_erddap_string(
+                    assemble_erddap_variables_dict(
+                        nc, settings["user_config_variable_attrs"], settings["user_config_variable_add_attrs"]
+                        )
+                    ),
+                "cdm_variables": create_cdm_variables_tags(cdm_types_vars_dict),
+                "subsetVariables": create_subset_variables_tag(cdm_types_vars_dict) if settings["use_cdm_vars_as_subset"] else "",
+                "erddap_datapath": settings["erddap_datapath"],
+                "cdm_altitude_proxy": create_cdm_altitude_proxy_tag(settings["cdm_altitude_proxy"])
+            }
+        return dataset_id, fragment.format(**fields_dict), None
+    except Exception as e:
+        return dataset_id, None, f"{type(e).__name__}: {e}"
+
+def render_dataset_batch(
+    ncfiles: typing.List[pathlib.Path],
+    fragment: str,
+    settings: dict) -> typing.List[typing.Tuple[str, typing.Optional[str], typing.Optional[str]]]:
+    """
+    Render several files in one worker task, see render_dataset().
+    """
+
+    return [render_dataset(ncfile, fragment, settings) for ncfile in ncfiles]
+
+def render_datasets(
+    ncfiles: typing.List[pathlib.Path],
+    fragment: str,
+    settings: dict,
+    workers: typing.Optional[int] = None) -> typing.Iterator[typing.Tuple[str, typing.Optional[str], typing.Optional[str]]]:
+    """
+    Render the <dataset> blocks of many files (see render_dataset()) in a
+    pool of `workers` processes, yielding them in the order of `ncfiles`
+    no matter which worker finishes first. With one worker, files are
+    rendered in this process.
+
+    Tasks of FILES_PER_TASK files are submitted only a few ahead of the
+    one being yielded, so memory doesn't grow with the number of files.
+    """
+
+    if workers == 1:
+        for ncfile in ncfiles:
+            yield render_dataset(ncfile, fragment, settings)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = collections.deque()
+        for i in range(0, len(ncfiles), FILES_PER_TASK):
+            pending.append(pool.submit(render_dataset_batch, ncfiles[i:i + FILES_PER_TASK], fragment, settings))
+            if len(pending) > 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_dataset_blocks(
+    ncfiles: typing.List[pathlib.Path],
+    fragment: str,
+    settings: dict,
+    workers: typing.Optional[int] = None) -> typing.Iterator[str]:
+    """
+    Yield the rendered <dataset> blocks of `ncfiles`, see render_datasets().
+    Files which fail are reported on stderr and skipped.
+    """
+
+    for dataset_id, dataset, error in render_datasets(ncfiles, fragment, settings, workers):
+        if error is not None:
+            print(f"skipping {dataset_id}: {error}", file=sys.stderr)
+            continue
+        yield dataset
+
+def get_file_identity(ncfile: pathlib.Path) -> typing.Optional[typing.Tuple[int, int]]:
+    """
+    Return (size, mtime in ns) of a file, or None if it can't be stat'ed.
+    """
+
+    try:
+        st = ncfile.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+class FragmentCache:
+    """
+    Manifest of rendered <dataset> blocks kept in a SQLite file, keyed by
+    the path, size and mtime of each NetCDF file, so unchanged files don't
+    have to be reopened.
+
+    Blocks also depend on the configuration and the fragment template, so
+    the whole manifest is dropped whenever the hash of either differs from
+    the one it was built with.
+    """
+
+    # rows stored between commits
+    COMMIT_EVERY = 1000
+
+    def __init__(self, db_path: pathlib.Path, config_hash: str, template_hash: str):
+        self.db = sqlite3.connect(str(db_path), timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS fragments (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                block TEXT NOT NULL
+            )
+        """)
+
+        hashes = {"config_hash": config_hash, "template_hash": template_hash}
+        if dict(self.db.execute("SELECT key, value FROM meta")) != hashes:
+            self.db.execute("DELETE FROM fragments")
+            self.db.execute("DELETE FROM meta")
+            self.db.executemany("INSERT INTO meta VALUES (?, ?)", hashes.items())
+        self.db.commit()
+
+        # {path: (size, mtime_ns)}, without the blocks themselves
+        self.manifest = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.db.execute("SELECT path, size, mtime_ns FROM fragments")
+        }
+        self.uncommitted = 0
+
+    @staticmethod
+    def key(ncfile: pathlib.Path) -> str:
+        return os.path.abspath(ncfile)
+
+    def has(self, ncfile: pathlib.Path, identity: typing.Optional[typing.Tuple[int, int]]) -> bool:
+        return identity is not None and self.manifest.get(self.key(ncfile)) == identity
+
+    def get(self, ncfile: pathlib.Path) -> str:
+        row = self.db.execute("SELECT block FROM fragments WHERE path = ?", (self.key(ncfile),)).fetchone()
+        return row[0]
+
+    def put(self, ncfile: pathlib.Path, identity: typing.Tuple[int, int], block: str) -> None:
+        key = self.key(ncfile)
+        self.db.execute("INSERT OR REPLACE INTO fragments VALUES (?, ?, ?, ?)", (key, identity[0], identity[1], block))
+        self.manifest[key] = identity
+        self._written()
+
+    def remove(self, ncfile: pathlib.Path) -> None:
+        key = self.key(ncfile)
+        if self.manifest.pop(key, None) is not None:
+            self.db.execute("DELETE FROM fragments WHERE path = ?", (key,))
+            self._written()
+
+    def prune(self, ncfiles: typing.List[pathlib.Path]) -> int:
+        """
+        Drop the blocks of files no longer in `ncfiles`. Returns how many.
+        """
+
+        keep = set(map(self.key, ncfiles))
+        gone = [key for key in self.manifest if key not in keep]
+        for key in gone:
+            del self.manifest[key]
+        self.db.executemany("DELETE FROM fragments WHERE path = ?", ((key,) for key in gone))
+        self.db.commit()
+        return len(gone)
+
+    def _written(self) -> None:
+        self.uncommitted += 1
+        if self.uncommitted >= self.COMMIT_EVERY:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+def get_config_hash(settings: dict) -> str:
+    """
+    Hash the settings <dataset> blocks are rendered with, see main().
+    """
+
+    text = json.dumps([FRAGMENT_CACHE_VERSION, settings], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def iter_cached_dataset_blocks(
+    ncfiles: typing.List[pathlib.Path],
+    fragment: str,
+    settings: dict,
+    cache: FragmentCache,
+    workers: typing.Optional[int] = None) -> typing.Iterator[str]:
+    """
+    Yield the rendered <dataset> blocks of `ncfiles`, in order, taking
+    those of unchanged files from `cache` and rendering only new or
+    changed files (see render_datasets()), whose blocks are then cached.
+    Files which fail are reported on stderr and skipped. Once all are
+    yielded, files no longer in `ncfiles` are dropped from the cache.
+    """
+
+    identities = [get_file_identity(ncfile) for ncfile in ncfiles]
+    stale = [not cache.has(ncfile, identity) for ncfile, identity in zip(ncfiles, identities)]
+    rendered = render_datasets([f for f, s in zip(ncfiles, stale) if s], fragment, settings, workers)
+
+    for ncfile, identity, is_stale in zip(ncfiles, identities, stale):
+        if not is_stale:
+            yield cache.get(ncfile)
+            continue
+
+        dataset_id, dataset, error = next(rendered)
+        if error is not None or identity is None:
+            print(f"skipping {dataset_id}: {error or 'file vanished'}", file=sys.stderr)
+            cache.remove(ncfile)
+            continue
+        cache.put(ncfile, identity, dataset)
+        yield dataset
+
+    removed = cache.prune(ncfiles)
+    if removed:
+        print(f"dropped {removed} deleted files from the fragment cache", file=sys.stderr)
+
+def iter_datasets_xml(
+    datasets: typing.Iterable[str],
+    header: typing.Optional[str] = None) -> typing.Iterator[str]:
+    """
+    Yield the pieces of a datasets.xml document as they're produced: the
+    header if given, the <dataset> blocks separated by newlines, then the
+    closing </erddapDatasets> tag if there's a header.
+    """
+
+    if header is not None:
+        yield header
+        yield "\n"
+
+    for i, dataset in enumerate(datasets):
+        if i:
+            yield "\n"
+        yield dataset
+
+    if header is not None:
+        yield "\n</erddapDatasets>"
+
+def write_datasets_xml(out_path: pathlib.Path, pieces: typing.Iterable[str]) -> None:
+    """
+    Write pieces of a document to `out_path` one at a time. They go to a
+    temporary file which replaces `out_path` once complete, so ERDDAP never
+    reads a half-written file and a failed run leaves the last one intact.
+    """
+
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            for piece in pieces:
+                f.write(piece)
+        os.replace(tmp_path, out_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def get_open_fd_count() -> typing.Optional[int]:
+    """
+    Return the number of file descriptors this process has open, or None
+    where that can't be listed.
+    """
+
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(fd_dir):
+            # less the one listing the directory
+            return len(os.listdir(fd_dir)) - 1
+    return None
+
+def get_peak_rss() -> typing.Tuple[typing.Optional[float], typing.Optional[float]]:
+    """
+    Return the peak resident set size, in MiB, of this process and of its
+    largest finished child process (e.g. a worker), or None where the
+    resource module isn't available.
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None, None
+
+    # ru_maxrss is in KiB, except on macOS where it's in bytes
+    unit = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+    return tuple(
+        resource.getrusage(who).ru_maxrss / unit
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+
+def print_resource_usage() -> None:
+    """
+    Report peak memory and open file descriptors on stderr.
+    """
+
+    rss, child_rss = get_peak_rss()
+    fds = get_open_fd_count()
+    parts = []
+    if rss is not None:
+        parts.append(f"peak RSS {rss:.1f} MiB")
+        if child_rss:
+            parts.append(f"largest worker {child_rss:.1f} MiB")
+    if fds is not None:
+        parts.append(f"{fds} open file descriptors")
+    if parts:
+        print(", ".join(parts), file=sys.stderr)
+
 def main(config_path) -> None:
     """
     Assemble a full datasets.xml file for a given set of NetCDF files
@@ -208,7 +564,7 @@ def main(config_path) -> None:
 
     # needed variables from configuration file
     with open(config_path, "r") as f:
-        cfg = yaml.load(f)
+        cfg = yaml.safe_load(f)
 
     fragments_path = pathlib.Path(cfg["fragments_path"])                   # str
     datapath = cfg["datapath"]                                             # str
@@ -220,51 +576,55 @@ def main(config_path) -> None:
     user_config_variable_add_attrs = cfg["user_config_variable_add_attrs"] # dict, metadata attrs in variables
     use_cdm_vars_as_subset = cfg.get("use_cdm_vars_as_subset", False)      # bool
     cdm_altitude_proxy = cfg.get("cdm_altitude_proxy", None)               # str
+    workers = cfg.get("workers", None)                                     # int, default CPU count
+    fragment_cache = cfg.get("fragment_cache", True)                       # str path, or bool
 
     # load user-defined <dataset></datasset> block
     with open(fragments_path / "datasets.fragment.xml", "r") as f:
         fragment = f.read()
 
-    # iterate through datasets in datapath; for each, fill in the needed
-    # fields in <dataset> block and create <dataVariable> blocks for each
-    # variable in the dataset.
-    # TODO make a generator
-    datasets = []
-    for ncfile in pathlib.Path(datapath).glob("*.nc"):
-    #for ncfile in pathlib.Path(datapath).glob("**/*_profile.nc"):
-        _fname = ncfile.name
-        nc = nc4.Dataset(ncfile)
-        cdm_types_vars_dict = create_cdm_variables_dict(cdm_data_type_dims, nc, user_config_variable_attrs)
-        fields_dict = {
-            "dataset_id": _fname.split(".nc")[0],
-            "filename": _fname,
-            "dataVariables": dump_variables_as_erddap_string(
-                assemble_erddap_variables_dict(
-                    nc, user_config_variable_attrs, user_config_variable_add_attrs
-                    )
-                ),
-            "cdm_variables": create_cdm_variables_tags(cdm_types_vars_dict),
-            "subsetVariables": create_subset_variables_tag(cdm_types_vars_dict) if use_cdm_vars_as_subset else "",
-            "erddap_datapath": erddap_datapath,
-            "cdm_altitude_proxy": create_cdm_altitude_proxy_tag(cdm_altitude_proxy)
-        }
-
-        # fill the fragment, add to list
-        datasets.append(fragment.format(**fields_dict))
+    settings = dict(
+        cdm_data_type_dims=cdm_data_type_dims,
+        erddap_datapath=erddap_datapath,
+        user_config_variable_attrs=user_config_variable_attrs,
+        user_config_variable_add_attrs=user_config_variable_add_attrs,
+        use_cdm_vars_as_subset=use_cdm_vars_as_subset,
+        cdm_altitude_proxy=cdm_altitude_proxy
+    )
 
+    header = None
     if add_header_footer:
         # load generic datasets.xml header fragment
         with open(pathlib.Path(fragments_path) / "datasets.header.xml", "r") as f:
             header = f.read()
-    
-        # concatenate header, body, footer
-        out_str = "{}\n{}\n</erddapDatasets>".format(header, "\n".join(datasets))
 
-    else: # just make the datasets groups
-        out_str = "\n".join(datasets)
+    # iterate through datasets in datapath, sorted by datasetID so the
+    # output doesn't depend on directory order; for each, fill in the
+    # needed fields in <dataset> block and create <dataVariable> blocks
+    # for each variable in the dataset. Each block is written out as soon
+    # as it's rendered, between the header and footer if wanted.
+    # Unless disabled, blocks of files unchanged since the last run come
+    # from a cache instead, see FragmentCache.
+    ncfiles = sorted(pathlib.Path(datapath).glob("*.nc"), key=get_dataset_id)
+    #ncfiles = sorted(pathlib.Path(datapath).glob("**/*_profile.nc"), key=get_dataset_id)
+    cache = None
+    if fragment_cache:
+        if fragment_cache is True:
+            fragment_cache = fragments_path / f"datasets.{outname}.cache.sqlite"
+        template_hash = hashlib.sha1(fragment.encode("utf-8")).hexdigest()
+        cache = FragmentCache(pathlib.Path(fragment_cache), get_config_hash(settings), template_hash)
+
+    try:
+        if cache is not None:
+            datasets = iter_cached_dataset_blocks(ncfiles, fragment, settings, cache, workers)
+        else:
+            datasets = iter_dataset_blocks(ncfiles, fragment, settings, workers)
+        write_datasets_xml(fragments_path / f"datasets.{outname}.xml", iter_datasets_xml(datasets, header))
+    finally:
+        if cache is not None:
+            cache.close()
 
-    with open(fragments_path / f"datasets.{outname}.xml", "w") as f:
-        f.write(out_str)
+    print_resource_usage()
 
 if __name__ == "__main__":
     main(
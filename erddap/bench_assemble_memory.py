@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Check that assemble_erddap_datasets_xml.py runs in flat memory and a
+bounded number of file handles as the number of NetCDF files grows.
+
+Synthetic collections of increasing size, in a mix of NetCDF4 and classic
+formats, are assembled in fresh interpreters with the fragment cache off.
+Each run has a low open-file limit, so datasets left open surface as
+EMFILE errors, and its peak RSS (of the process and its workers) is
+compared to that of the smallest collection. Exits non-zero if a run
+fails, drops datasets or grows past the budget.
+
+usage: bench_assemble_memory.py [-h] [--counts COUNTS] [--workers WORKERS]
+                                [--budget-mb BUDGET_MB] [--nofile NOFILE]
+
+optional arguments:
+  -h, --help            show this help message and exit
+  --counts COUNTS       comma-separated numbers of files to assemble;
+                        default 100,1000
+  --workers WORKERS     worker processes; default 2
+  --budget-mb BUDGET_MB
+                        maximum peak RSS growth over the smallest run;
+                        default 16
+  --nofile NOFILE       open file limit for each run; default 64
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import netCDF4 as nc4
+import numpy as np
+import yaml
+
+FORMATS = ("NETCDF4", "NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF3_64BIT_DATA")
+
+def make_dataset(path, i):
+    """
+    Write a small trajectory file, cycling through FORMATS by `i`.
+    """
+
+    with nc4.Dataset(path, "w", format=FORMATS[i % len(FORMATS)]) as nc:
+        nc.title = f"Glider {i}"
+        nc.cdm_data_type = "Trajectory"
+        nc.createDimension("time", 50)
+        nc.createDimension("traj", 1)
+        for name, units in (("time", "seconds since 1970-01-01"), ("lat", "degrees_north"), ("lon", "degrees_east")):
+            v = nc.createVariable(name, "f8", ("time",))
+            v.units = units
+            v[:] = np.arange(50)
+        depth = nc.createVariable("depth", "i2", ("time",))
+        depth.units = "m"
+        depth.scale_factor = 0.1
+        traj = nc.createVariable("trajectory", "i4", ("traj",))
+        traj.cf_role = "trajectory_id"
+
+def make_collection(root, count):
+    """
+    Lay out `count` files, fragments and a config under `root`.
+
+    Returns:
+        str, path of the config file
+    """
+
+    datapath = os.path.join(root, "data")
+    fragments_path = os.path.join(root, "fragments")
+    os.makedirs(datapath)
+    os.makedirs(fragments_path)
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ("datasets.fragment.xml", "datasets.header.xml"):
+        shutil.copy(os.path.join(here, name), fragments_path)
+    for i in range(count):
+        make_dataset(os.path.join(datapath, f"glider_{i:05d}.nc"), i)
+
+    cfg = dict(
+        fragments_path=fragments_path,
+        datapath=datapath,
+        erddap_datapath="/erddap/data/gliders",
+        cdm_data_type_dims=dict(trajectory=["traj"]),
+        outname="bench",
+        add_header_footer=True,
+        user_config_variable_attrs=dict(lat=dict(destinationName="latitude")),
+        user_config_variable_add_attrs=dict(),
+        fragment_cache=False
+    )
+    config_path = os.path.join(root, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(cfg, f)
+    return config_path
+
+def run_assembly(config_path, workers, nofile):
+    """
+    Assemble in a fresh interpreter.
+
+    Returns:
+        (exit status, peak RSS in MiB of it and its workers, stderr)
+    """
+
+    with open(config_path) as f:
+        cfg = yaml.safe_load(f)
+    cfg["workers"] = workers
+    with open(config_path, "w") as f:
+        yaml.safe_dump(cfg, f)
+
+    def limit_files():
+        resource.setrlimit(resource.RLIMIT_NOFILE, (nofile, nofile))
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assemble_erddap_datasets_xml.py")
+    with tempfile.TemporaryFile("w+") as err:
+        proc = subprocess.Popen([sys.executable, script, config_path], stderr=err, preexec_fn=limit_files)
+        # wait4 rather than Popen.wait, for the rusage of the finished run
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        err.seek(0)
+        stderr = err.read()
+
+    unit = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+    return proc.returncode, rusage.ru_maxrss / unit, stderr
+
+def main(counts, workers, budget_mb, nofile):
+    """
+    Run the benchmark and print a report.
+
+    Returns:
+        int, exit status
+    """
+
+    status = 0
+    peaks = []
+    for count in counts:
+        with tempfile.TemporaryDirectory() as root:
+            config_path = make_collection(root, count)
+            returncode, peak, stderr = run_assembly(config_path, workers, nofile)
+            assembled = 0
+            out_path = os.path.join(root, "fragments", "datasets.bench.xml")
+            if os.path.exists(out_path):
+                with open(out_path) as f:
+                    assembled = f.read().count('datasetID="glider_')
+
+        peaks.append(peak)
+        print(f"{count:>7} files: peak RSS {peak:.1f} MiB, {assembled} datasets")
+        if returncode != 0:
+            print(f"FAIL: exit status {returncode}\n{stderr}")
+            status = 1
+        elif assembled != count:
+            print(f"FAIL: {count - assembled} datasets missing\n{stderr}")
+            status = 1
+
+    growth = max(peaks) - peaks[0]
+    print(f"peak RSS growth {growth:.1f} MiB (budget {budget_mb:.1f} MiB)")
+    if growth > budget_mb:
+        print(f"FAIL: over budget by {growth - budget_mb:.1f} MiB")
+        status = 1
+    return status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", help="comma-separated numbers of files to assemble; default 100,1000", default="100,1000")
+    parser.add_argument("--workers", help="worker processes; default 2", type=int, default=2)
+    parser.add_argument("--budget-mb", help="maximum peak RSS growth over the smallest run; default 16", type=float, default=16.0)
+    parser.add_argument("--nofile", help="open file limit for each run; default 64", type=int, default=64)
+    args = parser.parse_args()
+    sys.exit(main(sorted(int(c) for c in args.counts.split(",")), args.workers, args.budget_mb, args.nofile))
@@ -0,0 +1,254 @@
+"""
+Read the header of a netCDF classic format file (CDF-1, CDF-2 or CDF-5)
+without the netCDF C library. Only names, data types, dimensions and
+attributes are read, never any data, which is all that
+assemble_erddap_datasets_xml.py needs. Anything else, e.g. a netCDF-4
+(HDF5) file, is opened with netCDF4 instead.
+
+The objects returned mimic the parts of netCDF4.Dataset and
+netCDF4.Variable the assembler uses, attribute values included: a single
+value comes back as a numpy scalar, several as an array and text as str.
+"""
+
+import mmap
+import os
+import struct
+import typing
+import netCDF4 as nc4
+import numpy as np
+
+# version byte after b"CDF" -> netCDF4 data_model
+DATA_MODELS = {
+    1: "NETCDF3_CLASSIC",
+    2: "NETCDF3_64BIT_OFFSET",
+    5: "NETCDF3_64BIT_DATA",
+}
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+# nc_type -> dtype of the values as stored, big-endian
+NC_TYPES = {
+    1: np.dtype(">i1"),   # NC_BYTE
+    2: np.dtype("S1"),    # NC_CHAR
+    3: np.dtype(">i2"),   # NC_SHORT
+    4: np.dtype(">i4"),   # NC_INT
+    5: np.dtype(">f4"),   # NC_FLOAT
+    6: np.dtype(">f8"),   # NC_DOUBLE
+    7: np.dtype(">u1"),   # NC_UBYTE
+    8: np.dtype(">u2"),   # NC_USHORT
+    9: np.dtype(">u4"),   # NC_UINT
+    10: np.dtype(">i8"),  # NC_INT64
+    11: np.dtype(">u8"),  # NC_UINT64
+}
+
+INT32 = struct.Struct(">i")
+INT64 = struct.Struct(">q")
+
+class HeaderAttributes:
+    """
+    netCDF4-style access to the attributes of a dataset or variable.
+    """
+
+    def __init__(self, attributes: typing.Dict[str, typing.Any]):
+        self._attributes = attributes
+
+    def ncattrs(self) -> typing.List[str]:
+        return list(self._attributes)
+
+    def getncattr(self, name: str) -> typing.Any:
+        try:
+            return self._attributes[name]
+        except KeyError:
+            raise AttributeError(f"attribute {name} not found") from None
+
+    def __getattr__(self, name: str) -> typing.Any:
+        # only called for names which aren't instance attributes
+        try:
+            return self.__dict__["_attributes"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+class HeaderVariable(HeaderAttributes):
+    """
+    A variable as described in the header.
+    """
+
+    def __init__(self, name: str, dtype: np.dtype, dimensions: typing.Tuple[str, ...], attributes: dict):
+        super().__init__(attributes)
+        self.name = name
+        self.dtype = dtype
+        self.dimensions = dimensions
+
+    def __repr__(self) -> str:
+        return f"<HeaderVariable {self.dtype} {self.name}({', '.join(self.dimensions)})>"
+
+class HeaderDataset(HeaderAttributes):
+    """
+    The header of a classic format file: its global attributes, and its
+    variables by name in file order.
+    """
+
+    def __init__(self, filepath: str, data_model: str, variables: dict, attributes: dict):
+        super().__init__(attributes)
+        self.filepath = filepath
+        self.data_model = data_model
+        self.variables = variables
+
+    def close(self) -> None:
+        # nothing is held open once the header is read
+        pass
+
+    def __enter__(self) -> "HeaderDataset":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"<HeaderDataset {self.data_model} {self.filepath}>"
+
+class HeaderParser:
+    """
+    Walk the header of a classic format file, following the grammar in
+    the netCDF file format specification. Counts ("NON_NEG") are 64-bit
+    in CDF-5 and 32-bit otherwise, while data offsets are 32-bit in CDF-1
+    only.
+    """
+
+    def __init__(self, buf: typing.Union[bytes, mmap.mmap], version: int):
+        self.buf = buf
+        self.pos = 4
+        self.count_struct = INT64 if version == 5 else INT32
+        self.offset_struct = INT32 if version == 1 else INT64
+
+    def unpack(self, fmt: struct.Struct) -> int:
+        value, = fmt.unpack_from(self.buf, self.pos)
+        self.pos += fmt.size
+        return value
+
+    def count(self) -> int:
+        n = self.unpack(self.count_struct)
+        if n < 0:
+            raise ValueError(f"negative count {n} at byte {self.pos}")
+        return n
+
+    def padded_bytes(self, n: int) -> bytes:
+        end = self.pos + n
+        if end > len(self.buf):
+            raise ValueError("header is truncated")
+        out = self.buf[self.pos:end]
+        self.pos = end + -n % 4
+        return out
+
+    def name(self) -> str:
+        return self.padded_bytes(self.count()).decode("utf-8")
+
+    def list_length(self, tag: int) -> int:
+        """
+        Read the tag and length starting a list, which are both zero
+        where the list is absent.
+        """
+
+        found = self.unpack(INT32)
+        n = self.count()
+        if found != tag and (found != 0 or n != 0):
+            raise ValueError(f"expected list tag {tag}, found {found}")
+        return n
+
+    def nc_type(self) -> np.dtype:
+        nc_type = self.unpack(INT32)
+        if nc_type not in NC_TYPES:
+            raise ValueError(f"unknown nc_type {nc_type}")
+        return NC_TYPES[nc_type]
+
+    def attributes(self) -> typing.Dict[str, typing.Any]:
+        out = dict()
+        for _ in range(self.list_length(NC_ATTRIBUTE)):
+            name = self.name()
+            dtype = self.nc_type()
+            raw = self.padded_bytes(self.count() * dtype.itemsize)
+            out[name] = decode_attribute(name, dtype, raw)
+        return out
+
+    def parse(self, filepath: str, data_model: str) -> HeaderDataset:
+        self.unpack(self.count_struct) # number of records
+
+        dimensions = []
+        for _ in range(self.list_length(NC_DIMENSION)):
+            dimensions.append(self.name())
+            self.count() # length, 0 for the record dimension
+        attributes = self.attributes()
+
+        variables = dict()
+        for _ in range(self.list_length(NC_VARIABLE)):
+            name = self.name()
+            dimids = [self.count() for _ in range(self.count())]
+            var_attributes = self.attributes()
+            dtype = self.nc_type().newbyteorder("=")
+            self.unpack(self.count_struct)  # vsize
+            self.unpack(self.offset_struct) # begin
+            try:
+                var_dimensions = tuple(dimensions[i] for i in dimids)
+            except IndexError:
+                raise ValueError(f"variable {name} has an unknown dimension id") from None
+            variables[name] = HeaderVariable(name, dtype, var_dimensions, var_attributes)
+
+        return HeaderDataset(filepath, data_model, variables, attributes)
+
+def decode_attribute(name: str, dtype: np.dtype, raw: bytes) -> typing.Any:
+    """
+    Convert the raw bytes of an attribute value the way netCDF4 does:
+    text to str with any NULs dropped (except a _FillValue, which stays
+    bytes), one number to a numpy scalar, several to an array, all in
+    native byte order.
+    """
+
+    if dtype.kind == "S":
+        if name == "_FillValue":
+            return raw
+        return raw.decode("utf-8", errors="replace").replace("\x00", "")
+
+    values = np.frombuffer(raw, dtype).astype(dtype.newbyteorder("="))
+    if len(values) == 1:
+        return values[0]
+    return values
+
+def read_header(filepath: typing.Union[str, os.PathLike]) -> typing.Optional[HeaderDataset]:
+    """
+    Parse the header of a classic format file.
+
+    Parameters
+    ----------
+    filepath: path to the file
+
+    Returns
+    -------
+    HeaderDataset, or None if the file isn't in a classic format
+    """
+
+    with open(filepath, "rb") as f:
+        magic = f.read(4)
+        if len(magic) < 4 or magic[:3] != b"CDF" or magic[3] not in DATA_MODELS:
+            return None
+        # the header is parsed straight from the page cache, and only the
+        # pages it spans are ever read
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            try:
+                return HeaderParser(buf, magic[3]).parse(str(filepath), DATA_MODELS[magic[3]])
+            except struct.error:
+                raise ValueError(f"{filepath}: header is truncated") from None
+
+def open_dataset(filepath: typing.Union[str, os.PathLike]) -> typing.Union[HeaderDataset, nc4.Dataset]:
+    """
+    Open a file for its metadata: classic format files by reading their
+    header, anything else with netCDF4.
+
+    Use as a context manager, as either kind of object may need closing.
+    """
+
+    header = read_header(filepath)
+    if header is None:
+        return nc4.Dataset(filepath)
+    return header
@@ -0,0 +1,117 @@
+"""
+Check that netcdf_header reads classic format files exactly as netCDF4
+does, for the parts assemble_erddap_datasets_xml.py uses: variable names
+in order, dtypes, dimensions, and attribute names, values and types.
+
+Run with `python -m pytest erddap/test_netcdf_header.py`.
+"""
+
+import netCDF4 as nc4
+import numpy as np
+import pytest
+
+import netcdf_header
+
+CLASSIC_FORMATS = ("NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF3_64BIT_DATA")
+
+# types every classic format has; CDF-5 adds the unsigned and 64-bit ones
+CLASSIC_TYPES = ("i1", "i2", "i4", "f4", "f8")
+CDF5_TYPES = ("u1", "u2", "u4", "i8", "u8")
+
+def write_dataset(path, data_model):
+    """
+    Write a file exercising every type and the awkward attribute values.
+    """
+
+    with nc4.Dataset(path, "w", format=data_model) as nc:
+        nc.createDimension("time", None)
+        nc.createDimension("ñame", 3)
+        nc.createDimension("strlen", 5)
+
+        nc.title = "tïtle with a \x00 NUL"
+        nc.empty_text = ""
+        nc.single = np.int16(3)
+        nc.several = np.array([1.5, 2.5, -3.25])
+        nc.empty = np.array([], "f4")
+
+        types = CLASSIC_TYPES + (CDF5_TYPES if data_model == "NETCDF3_64BIT_DATA" else ())
+        for t in types:
+            v = nc.createVariable(f"v_{t}", t, ("time", "ñame"), fill_value=np.dtype(t).type(7))
+            v.single = np.dtype(t).type(1)
+            v.several = np.array([0, 1, 2], t)
+            v.long_name = f"a {t} variable"
+
+        c = nc.createVariable("chars", "S1", ("time", "strlen"), fill_value=b"z")
+        c.flag_meanings = "good bad"
+        c[0] = np.array(list("abcde"), "S1")
+
+        nc.createVariable("scalar", "f8", ())
+
+def assert_same_value(ours, theirs):
+    assert type(ours) is type(theirs)
+    if isinstance(theirs, (np.ndarray, np.generic)):
+        assert ours.dtype == theirs.dtype
+        assert np.shape(ours) == np.shape(theirs)
+        assert np.array_equal(ours, theirs)
+    else:
+        assert ours == theirs
+
+def assert_same_attributes(ours, theirs):
+    assert ours.ncattrs() == theirs.ncattrs()
+    for name in theirs.ncattrs():
+        assert_same_value(ours.getncattr(name), theirs.getncattr(name))
+        assert_same_value(getattr(ours, name), getattr(theirs, name))
+
+def assert_same_dataset(path):
+    with netcdf_header.open_dataset(path) as ours, nc4.Dataset(path) as theirs:
+        assert isinstance(ours, netcdf_header.HeaderDataset)
+        assert ours.data_model == theirs.data_model
+        assert_same_attributes(ours, theirs)
+        assert list(ours.variables) == list(theirs.variables)
+        for name, var in theirs.variables.items():
+            assert ours.variables[name].name == var.name
+            assert ours.variables[name].dtype == var.dtype
+            assert str(ours.variables[name].dtype) == str(var.dtype)
+            assert ours.variables[name].dimensions == var.dimensions
+            assert_same_attributes(ours.variables[name], var)
+
+@pytest.mark.parametrize("data_model", CLASSIC_FORMATS)
+def test_matches_netcdf4(tmp_path, data_model):
+    path = tmp_path / "all_types.nc"
+    write_dataset(path, data_model)
+    assert_same_dataset(path)
+
+@pytest.mark.parametrize("data_model", CLASSIC_FORMATS)
+def test_no_variables(tmp_path, data_model):
+    path = tmp_path / "empty.nc"
+    with nc4.Dataset(path, "w", format=data_model):
+        pass
+    assert_same_dataset(path)
+
+@pytest.mark.parametrize("data_model", CLASSIC_FORMATS)
+def test_truncated_header(tmp_path, data_model):
+    path = tmp_path / "all_types.nc"
+    write_dataset(path, data_model)
+    header = path.read_bytes()
+    for size in (4, 8, 40, 200):
+        path.write_bytes(header[:size])
+        with pytest.raises(ValueError):
+            netcdf_header.read_header(path)
+
+def test_netcdf4_falls_back(tmp_path):
+    path = tmp_path / "hdf5.nc"
+    with nc4.Dataset(path, "w", format="NETCDF4") as nc:
+        nc.title = "HDF5"
+    assert netcdf_header.read_header(path) is None
+    with netcdf_header.open_dataset(path) as nc:
+        assert isinstance(nc, nc4.Dataset)
+        assert nc.title == "HDF5"
+
+def test_missing_attribute(tmp_path):
+    path = tmp_path / "all_types.nc"
+    write_dataset(path, "NETCDF3_CLASSIC")
+    with netcdf_header.open_dataset(path) as nc:
+        with pytest.raises(AttributeError):
+            nc.getncattr("no_such_attribute")
+        with pytest.raises(AttributeError):
+            nc.variables["v_i2"].no_such_attribute
@@ -0,0 +1,411 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Keep a persistent index of dataset extents, built from the JSON records
+`get_geo_attrs.py --batch` prints, to find the datasets intersecting a
+bounding box and time window without rescanning them.
+
+The index is a SQLite database holding each record, with an R*Tree over
+longitude, latitude and time to narrow queries down before the exact
+test. Where SQLite was built without the R*Tree module, the same queries
+fall back to B-tree indexes on the extent columns.
+
+usage: geo_extent_index.py [-h] index {add,remove,prune,query} ...
+
+positional arguments:
+  index                 SQLite file holding the index
+    add                 add or replace datasets from JSON record files
+                        (- for stdin)
+    remove              remove datasets by path
+    prune               remove local datasets which no longer exist
+    query               print the paths of datasets intersecting a bounding
+                        box and/or time window
+
+query arguments:
+  --bbox BBOX           west,south,east,north in degrees; west > east
+                        crosses the antimeridian
+  --time TIME           start,end as ISO 8601 dates or times; either may be
+                        empty for an open interval
+  --json                print whole records rather than paths
+
+For example:
+
+    get_geo_attrs.py --batch --k /data/*.nc | geo_extent_index.py idx.sqlite add -
+    geo_extent_index.py idx.sqlite query --bbox=-90,20,-80,30 --time 2021-03-01,
+
+(--bbox=... keeps a leading minus sign from being read as an option.) A
+dataset only matches a query on an axis it has an extent for: one without
+a time coverage never matches a --time query, for instance.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+
+# R*Tree coordinates are 32-bit floats; the R*Tree only narrows a query
+# down, so "unknown" is stored as a range matching everything
+RTREE_UNBOUNDED = 3e38
+
+def parse_time(value):
+    """
+    Parse an ISO 8601 date or time, as in time_coverage_start, to seconds
+    since 1970-01-01 UTC. Times without a zone are taken as UTC.
+
+    Args:
+        value (str): e.g. "2021-03-01T00:00:00Z" or "2021-03-01"
+
+    Returns:
+        float, or None if `value` is empty
+
+    Raises:
+        ValueError if `value` isn't an ISO 8601 date or time
+    """
+
+    if not value or not value.strip():
+        return
+    try:
+        t = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("expected an ISO 8601 date or time, got {!r}".format(value)) from None
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=datetime.timezone.utc)
+    return t.timestamp()
+
+def parse_time_window(value):
+    """
+    Parse a start,end time window, either end of which may be empty.
+
+    Args:
+        value (str): e.g. "2021-03-01,2021-04-01" or "2021-03-01,"
+
+    Returns:
+        tuple of 2 floats or Nones, see parse_time()
+    """
+
+    start, _, end = value.partition(",")
+    return (parse_time(start), parse_time(end))
+
+def parse_bbox(value):
+    """
+    Parse a west,south,east,north bounding box.
+
+    Args:
+        value (str): e.g. "-90,20,-80,30"
+
+    Returns:
+        tuple of 4 floats
+    """
+
+    try:
+        bbox = tuple(float(v) for v in value.split(","))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4:
+        raise ValueError("expected west,south,east,north, got {!r}".format(value))
+    return bbox
+
+def parse_record_time(value):
+    """
+    Parse a time from a record, where one that can't be parsed is
+    treated as unknown rather than failing the whole record.
+
+    Args:
+        value (str): see parse_time()
+
+    Returns:
+        float, or None
+    """
+
+    try:
+        return parse_time(value)
+    except ValueError:
+        return
+
+def get_record_bounds(record):
+    """
+    Pull the bounding box and time window out of a record.
+
+    Args:
+        record (dict): see get_geo_attrs.describe_dataset()
+
+    Returns:
+        dict of lon_min, lon_max, lat_min, lat_max, time_start and
+        time_end, each None where the record has no such extent
+    """
+
+    extents = record.get("extents") or {}
+    coverage = record.get("time_coverage") or {}
+    lat = extents.get("lat") or {}
+    lon = extents.get("lon") or {}
+    return {
+        "lon_min": lon.get("min"),
+        "lon_max": lon.get("max"),
+        "lat_min": lat.get("min"),
+        "lat_max": lat.get("max"),
+        "time_start": parse_record_time(coverage.get("start")),
+        "time_end": parse_record_time(coverage.get("end"))
+    }
+
+class GeoExtentIndex(object):
+    """
+    Index of dataset extents in a SQLite file.
+
+    Records are keyed by path: adding a dataset again replaces it, so an
+    index is kept current by feeding it the records of changed files and
+    removing those of deleted ones.
+    """
+
+    def __init__(self, db_path, use_rtree=True):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path, timeout=60)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS datasets (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                lon_min REAL,
+                lon_max REAL,
+                lat_min REAL,
+                lat_max REAL,
+                time_start REAL,
+                time_end REAL,
+                record TEXT NOT NULL
+            )
+        """)
+        for column in ("lon_min", "lat_min", "time_start"):
+            self.db.execute("CREATE INDEX IF NOT EXISTS datasets_{0} ON datasets ({0})".format(column))
+
+        self.rtree = False
+        if use_rtree:
+            try:
+                self.db.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS datasets_rtree USING rtree(
+                        id, lon_min, lon_max, lat_min, lat_max, time_start, time_end
+                    )
+                """)
+                self.rtree = True
+            except sqlite3.OperationalError:
+                # SQLite built without the R*Tree module
+                pass
+        self.db.commit()
+
+    def insert(self, record, commit=True):
+        """
+        Add a dataset, replacing any entry for the same path.
+
+        Args:
+            record (dict): see get_geo_attrs.describe_dataset()
+            commit (bool): commit straight away; default True
+
+        Returns:
+            None
+        """
+
+        self.remove(record["path"], commit=False)
+        bounds = get_record_bounds(record)
+        columns = ("lon_min", "lon_max", "lat_min", "lat_max", "time_start", "time_end")
+        cursor = self.db.execute(
+            "INSERT INTO datasets (path, {}, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?)".format(", ".join(columns)),
+            (record["path"],) + tuple(bounds[c] for c in columns) + (json.dumps(record),)
+        )
+        if self.rtree:
+            box = []
+            for low, high in (("lon_min", "lon_max"), ("lat_min", "lat_max"), ("time_start", "time_end")):
+                if bounds[low] is None or bounds[high] is None:
+                    box.extend([-RTREE_UNBOUNDED, RTREE_UNBOUNDED])
+                else:
+                    box.extend([bounds[low], bounds[high]])
+            self.db.execute("INSERT INTO datasets_rtree VALUES (?, ?, ?, ?, ?, ?, ?)", [cursor.lastrowid] + box)
+        if commit:
+            self.db.commit()
+
+    def remove(self, path, commit=True):
+        """
+        Remove a dataset, if indexed.
+
+        Args:
+            path (str)   : path or URL of the dataset
+            commit (bool): commit straight away; default True
+
+        Returns:
+            bool, whether it was indexed
+        """
+
+        row = self.db.execute("SELECT id FROM datasets WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM datasets WHERE id = ?", row)
+            if self.rtree:
+                self.db.execute("DELETE FROM datasets_rtree WHERE id = ?", row)
+        if commit:
+            self.db.commit()
+        return row is not None
+
+    def paths(self):
+        """
+        Returns:
+            list of the paths of all indexed datasets
+        """
+
+        return [path for path, in self.db.execute("SELECT path FROM datasets ORDER BY path")]
+
+    def query(self, bbox=None, time=None, records=False):
+        """
+        Find the datasets intersecting a bounding box and time window.
+
+        Args:
+            bbox (tuple)  : (west, south, east, north) in degrees, or None;
+                            west > east crosses the antimeridian
+            time (tuple)  : (start, end) in seconds since 1970-01-01 UTC,
+                            either of which may be None, or None
+            records (bool): return records instead of paths; default False
+
+        Returns:
+            list of str or dict, ordered by path
+        """
+
+        where, params = [], []
+        if bbox is not None:
+            west, south, east, north = bbox
+            where.append("d.lat_max >= ? AND d.lat_min <= ?")
+            params.extend([south, north])
+            if west <= east:
+                where.append("d.lon_max >= ? AND d.lon_min <= ?")
+                params.extend([west, east])
+            else:
+                where.append("d.lon_min IS NOT NULL AND (d.lon_max >= ? OR d.lon_min <= ?)")
+                params.extend([west, east])
+        if time is not None:
+            start, end = time
+            where.append("d.time_start IS NOT NULL AND d.time_end IS NOT NULL")
+            if start is not None:
+                where.append("d.time_end >= ?")
+                params.append(start)
+            if end is not None:
+                where.append("d.time_start <= ?")
+                params.append(end)
+
+        sql = "SELECT d.path, d.record FROM datasets d"
+        if self.rtree and where:
+            # the R*Tree narrows the search down, the exact test follows
+            box_where, box_params = [], []
+            if bbox is not None:
+                box_where.append("r.lat_max >= ? AND r.lat_min <= ?")
+                box_params.extend([south, north])
+                if west <= east:
+                    box_where.append("r.lon_max >= ? AND r.lon_min <= ?")
+                    box_params.extend([west, east])
+            if time is not None:
+                if start is not None:
+                    box_where.append("r.time_end >= ?")
+                    box_params.append(start)
+                if end is not None:
+                    box_where.append("r.time_start <= ?")
+                    box_params.append(end)
+            if box_where:
+                sql += " JOIN datasets_rtree r ON r.id = d.id AND " + " AND ".join(box_where)
+                params = box_params + params
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY d.path"
+
+        rows = self.db.execute(sql, params)
+        if records:
+            return [json.loads(record) for _, record in rows]
+        return [path for path, _ in rows]
+
+    def close(self):
+        self.db.close()
+
+def read_records(sources):
+    """
+    Yield JSON records, one per line, from files or stdin.
+
+    Args:
+        sources (list of str): file paths, or "-" for stdin
+
+    Returns:
+        generator of dict
+    """
+
+    for source in sources:
+        fp = sys.stdin if source == "-" else open(source)
+        try:
+            for line in fp:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            if fp is not sys.stdin:
+                fp.close()
+
+def main(args):
+    """
+    Run one index command.
+
+    Returns:
+        int, exit status
+    """
+
+    index = GeoExtentIndex(args.index)
+    try:
+        if args.command == "add":
+            added = skipped = 0
+            for record in read_records(args.records):
+                if record.get("error"):
+                    skipped += 1
+                    print("skipping {}: {}".format(record["path"], record["error"]), file=sys.stderr)
+                    continue
+                index.insert(record, commit=False)
+                added += 1
+            index.db.commit()
+            print("{} added, {} skipped".format(added, skipped), file=sys.stderr)
+
+        elif args.command == "remove":
+            for path in args.paths:
+                if not index.remove(path, commit=False):
+                    print("not indexed: {}".format(path), file=sys.stderr)
+            index.db.commit()
+
+        elif args.command == "prune":
+            for path in index.paths():
+                if "://" not in path and not os.path.exists(path):
+                    index.remove(path, commit=False)
+                    print("removed {}".format(path), file=sys.stderr)
+            index.db.commit()
+
+        else:
+            for match in index.query(args.bbox, args.time, records=args.json):
+                print(json.dumps(match) if args.json else match)
+    finally:
+        index.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("index", help="SQLite file holding the index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add or replace datasets from JSON record files (- for stdin)")
+    add.add_argument("records", help="files of JSON records, one per line", nargs="+")
+
+    remove = commands.add_parser("remove", help="remove datasets by path")
+    remove.add_argument("paths", help="paths or URLs of datasets", nargs="+")
+
+    commands.add_parser("prune", help="remove local datasets which no longer exist")
+
+    query = commands.add_parser("query", help="print the paths of datasets intersecting a bounding box and/or time window")
+    query.add_argument("--bbox", help="west,south,east,north in degrees; west > east crosses the antimeridian")
+    query.add_argument("--time", help="start,end as ISO 8601 dates or times; either may be empty for an open interval")
+    query.add_argument("--json", help="print whole records rather than paths", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "query":
+        # checked up front, so a typo is an error rather than a wider query
+        try:
+            args.bbox = parse_bbox(args.bbox) if args.bbox else None
+            args.time = parse_time_window(args.time) if args.time is not None else None
+        except ValueError as e:
+            query.error(str(e))
+    sys.exit(main(args))
@@ -2,185 +2,3291 @@
 # -*- coding: utf-8 -*-
 
 """
-Use this script to generate geospatial extent metadata and suggested keywords.
+Use this script to generate geospatial extent, vertical extent and time
+coverage metadata and suggested keywords.
 
-usage: get_geo_attrs.py [-h] [--k] dataset
+usage: get_geo_attrs.py [-h] [--k] [--header-only] [--dap-cache]
+                        [--dap-cache-dir DAP_CACHE_DIR] [--batch]
+                        [--workers WORKERS] [--cache]
+                        [--cache-file CACHE_FILE]
+                        [--cache-max-size CACHE_MAX_SIZE] [--cache-hash]
+                        [--refresh] [--incremental]
+                        [--read-workers READ_WORKERS] [--max-memory MAX_MEMORY]
+                        [--approx] [--bounds]
+                        [--bounds-vertices BOUNDS_VERTICES]
+                        [--aggregate AGGREGATE] [--profile]
+                        dataset [dataset ...]
 
 positional arguments:
-  dataset     dataset to get extents for; must be .nc or OPeNDAP
+  dataset        dataset to get extents for; must be .nc or OPeNDAP. With
+                 --batch or --aggregate, any number of datasets, globs or
+                 directories
 
 optional arguments:
-  -h, --help  show this help message and exit
-  --k         don't print auto-generated keywords
+  -h, --help     show this help message and exit
+  --k            don't print auto-generated keywords
+  --header-only  take extents from attributes where possible and report
+                 where each value came from
+  --dap-cache    cache OPeNDAP responses, by default in
+                 ~/.cache/get_geo_attrs/dap
+  --dap-cache-dir DAP_CACHE_DIR
+                 directory for --dap-cache, which it implies
+  --batch        describe every dataset as one JSON line on stdout, in
+                 the order they finish
+  --workers WORKERS
+                 number of processes for --batch; default is the CPU count
+  --cache        cache results for unchanged files in a SQLite file, by
+                 default ~/.cache/get_geo_attrs/extents.sqlite
+  --cache-file CACHE_FILE
+                 SQLite file for --cache, which it implies
+  --cache-max-size CACHE_MAX_SIZE
+                 evict least recently used cache entries, including
+                 --incremental state, beyond this size, e.g. 64M
+  --cache-hash   also require an unchanged SHA-1 of the file contents for
+                 a cache hit
+  --refresh      recompute results even if cached, rescanning growing
+                 variables in full
+  --incremental  with --cache, only read records appended along an
+                 unlimited dimension since the last run; earlier records
+                 are checked for rewrites by hashing a sample of 64 of
+                 them, so use --refresh after rewriting others
+  --read-workers READ_WORKERS
+                 number of processes decompressing and reducing large
+                 variables of a local file in parallel
+  --max-memory MAX_MEMORY
+                 bytes each process may hold to scan a variable, e.g.
+                 256M
+  --approx       estimate extents from a sample of each variable and
+                 report error bounds
+  --bounds       also print a geospatial_bounds footprint
+  --bounds-vertices BOUNDS_VERTICES
+                 most vertices in the --bounds footprint, which it
+                 implies; default 64
+  --aggregate AGGREGATE
+                 JSON file of a collection's extents; merge the datasets
+                 into it and print the collection's attributes
+  --profile      report time per phase and per variable and bytes read
+                 per variable as JSON, on stderr or in each --batch
+                 record
 
 """
 
 import argparse
+import contextlib
+import copy
+import datetime
+import functools
+import glob
+import hashlib
+import importlib.util
+import itertools
 import json
-import netCDF4
-import numpy as np
+import mmap
 import os
-from compliance_checker.cf import util
+import re
+import struct
+import sys
+import time
 
-def get_geo_extents(nc, possible_units, std_name, axis_name, short_name):
+def lazy_import(name):
     """
-    Get the geospatial extents for a NetCDF file, if available.
+    Import a module which is only executed on its first attribute access,
+    so runs that never touch it (cache hits, --k) don't pay to load it.
+
+    Args:
+        name (str): module name
+
+    Returns:
+        module
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# heavy dependencies; modules only needed by one code path (sqlite3,
+# concurrent.futures, xml.etree, compliance_checker) are imported there
+netCDF4 = lazy_import('netCDF4')
+np = lazy_import('numpy')
+
+# upper bound on the number of elements held in memory by a single read
+MAX_BLOCK_ELEMENTS = 2 ** 22
+
+# elements read to confirm a 1-D coordinate variable is monotonic
+MONOTONIC_SAMPLES = 16
+
+# elements read per variable to estimate its extent with --approx
+APPROX_SAMPLES = 2 ** 12
+
+# records of a growing variable hashed to tell whether those already
+# reduced have since been rewritten, see get_record_fingerprint()
+FINGERPRINT_RECORDS = 64
+
+# vertices allowed in a geospatial_bounds polygon by default
+BOUNDS_MAX_VERTICES = 64
+
+# while points are folded into a footprint, its running hull is simplified
+# to this many times the vertex budget, so it doesn't grow with the points
+BOUNDS_RUNNING_FACTOR = 4
+
+# peak bytes held per block element while scanning: the float64 block, the
+# read and difference temporaries, and the slices carried across blocks
+SCAN_BYTES_PER_ELEMENT = 40
+
+# share of a --max-memory cap given to HDF5's chunk cache, whose default of
+# 64 MiB per variable would otherwise dominate a small cap
+CHUNK_CACHE_SHARE = 0.25
+
+# default location of on-disk caches
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'get_geo_attrs'
+)
+
+def is_time_units(units):
+    """
+    Check whether units are CF time units, e.g. "seconds since 1970-01-01".
+
+    Args:
+        units (str): units
+
+    Returns:
+        bool
+    """
+
+    return isinstance(units, str) and ' since ' in units
+
+# make dict to unpack in the get_geo_extents() function; std_name may also
+# be a tuple of names, possible_units a predicate, and min_score raises the
+# score a variable needs to count
+GEO_CFG = {
+    "lat": {
+        "possible_units": (
+            'degrees_north',
+            'degree_north',
+            'degrees_N',
+            'degree_N',
+            'degreesN',
+            'degreeN'
+        ),
+        "std_name": "latitude",
+        "axis_name": "Y",
+        "short_name": "lat"
+    },
+
+    "lon": {
+        "possible_units": (
+            'degrees_east',
+            'degree_east',
+            'degrees_E',
+            'degree_E',
+            'degreesE',
+            'degreeE'
+        ),
+        "std_name": "longitude",
+        "axis_name": "X",
+        "short_name": "lon"
+
+    },
+
+    # "m" alone is too common to be evidence of a vertical coordinate
+    "vertical": {
+        "possible_units": (
+            'm',
+            'meter',
+            'meters',
+            'metre',
+            'metres',
+            'km'
+        ),
+        "std_name": (
+            "depth",
+            "altitude",
+            "height",
+            "height_above_mean_sea_level"
+        ),
+        "axis_name": "Z",
+        "short_name": "vertical",
+        "min_score": 2
+    }
+}
+
+# units the candidates for an extent may have -> (base unit, factor to
+# it), so candidates in different units are converted before they're
+# merged; other units only merge with the same units
+UNIT_CONVERSIONS = dict(
+    [(u, ("degrees_north", 1.0)) for u in GEO_CFG["lat"]["possible_units"]] +
+    [(u, ("degrees_east", 1.0)) for u in GEO_CFG["lon"]["possible_units"]] +
+    [(u, ("m", 1.0)) for u in ('m', 'meter', 'meters', 'metre', 'metres')] +
+    [('km', ("m", 1000.0))]
+)
+
+# unpacked into compute_time_coverage()
+TIME_CFG = {
+    "possible_units": is_time_units,
+    "std_name": "time",
+    "axis_name": "T",
+    "short_name": "time"
+}
+
+# bump when records change shape or how they are computed, so cached
+# records are recomputed
+RECORD_VERSION = 8
+
+def get_block_shape(var, max_elements=MAX_BLOCK_ELEMENTS):
+    """
+    Pick the shape of the blocks used to read a variable.
+
+    Blocks start from the on-disk chunk shape (a single element for
+    contiguous variables) and are grown along the trailing axes in whole
+    chunks while they stay under `max_elements`. A chunk which is larger
+    than `max_elements` on its own is split along its leading axes.
+
+    Args:
+        var (netCDF4.Variable): variable to read
+        max_elements (int)    : maximum number of elements per block
+
+    Returns:
+        list of int, one entry per dimension
+    """
+
+    shape = var.shape
+    chunking = var.chunking()
+    if isinstance(chunking, (list, tuple)):
+        block = [min(c, n) for c, n in zip(chunking, shape)]
+    else:
+        block = [1] * len(shape)
+    block = [max(b, 1) for b in block]
+
+    # grow along the trailing axes, in multiples of the chunk size
+    for axis in reversed(range(len(shape))):
+        others = int(np.prod(block)) // block[axis]
+        fits = max(max_elements // others, 1)
+        grown = min(shape[axis], max(block[axis], fits // block[axis] * block[axis]))
+        if grown < shape[axis]:
+            block[axis] = grown
+            break
+        block[axis] = max(shape[axis], 1)
+
+    # split oversized chunks along the leading axes
+    for axis in range(len(shape)):
+        if int(np.prod(block)) <= max_elements:
+            break
+        others = int(np.prod(block)) // block[axis]
+        block[axis] = max(max_elements // others, 1)
+
+    return block
+
+def iter_blocks(var, max_elements=MAX_BLOCK_ELEMENTS, start=0, stop=None):
+    """
+    Yield tuples of slices tiling a variable in C order, see get_block_shape().
+
+    Args:
+        var (netCDF4.Variable): variable to read
+        max_elements (int)    : maximum number of elements per block
+        start (int)           : skip everything before this index along the
+                                first axis; default 0
+        stop (int)            : skip everything from this index along the
+                                first axis; default None, the end
+
+    Returns:
+        generator of tuples of slices
+    """
+
+    shape = var.shape
+    block = get_block_shape(var, max_elements)
+    bounds = [[(i, min(i + b, n)) for i in range(0, n, b)] for n, b in zip(shape, block)]
+    if start:
+        bounds[0] = [(max(i, start), j) for i, j in bounds[0] if j > start]
+    if stop is not None:
+        bounds[0] = [(i, min(j, stop)) for i, j in bounds[0] if i < stop]
+    for blk in itertools.product(*bounds):
+        yield tuple(slice(i, j) for i, j in blk)
+
+def read_block(var, index):
+    """
+    Read a block of a variable as a float64 array with NaN in place of masked values.
+
+    Args:
+        var (netCDF4.Variable): variable to read
+        index (tuple)         : tuple of slices, as from iter_blocks()
+
+    Returns:
+        numpy.ndarray
+    """
+
+    data = var[index] if index else var[...]
+    return np.ma.filled(np.ma.asarray(data, dtype=np.float64), np.nan)
+
+def get_packing(var):
+    """
+    Get the scale_factor and add_offset unpacking a variable's data.
+
+    Args:
+        var (netCDF4.Variable): variable to read
+
+    Returns:
+        tuple of (scale, offset), (1.0, 0.0) for unpacked variables
+    """
+
+    attrs = var.ncattrs()
+    scale = float(np.ravel(var.scale_factor)[0]) if 'scale_factor' in attrs else 1.0
+    offset = float(np.ravel(var.add_offset)[0]) if 'add_offset' in attrs else 0.0
+    return scale, offset
+
+def get_invalid_values(var, dtype):
+    """
+    Get the raw values netCDF4 would mask when reading a variable: its
+    _FillValue (or the library default for non-byte types when unset and
+    filling is on), its missing_value(s) and anything outside valid_range
+    or valid_min/valid_max.
+
+    Args:
+        var (netCDF4.Variable): variable to read
+        dtype (numpy.dtype)   : dtype of the raw data
+
+    Returns:
+        tuple of (list of excluded values, valid min or None, valid max or None)
+    """
+
+    attrs = var.ncattrs()
+    cast = lambda v: np.array(v).astype(var.dtype).astype(dtype)
+
+    excluded = []
+    if 'missing_value' in attrs:
+        excluded.extend(np.ravel(cast(var.missing_value)))
+    if '_FillValue' in attrs:
+        excluded.append(cast(var._FillValue))
+    elif var.dtype.str[1:] in netCDF4.default_fillvals and (var.dtype.itemsize > 1 or var.get_fill_value() is not None):
+        excluded.append(cast(netCDF4.default_fillvals[var.dtype.str[1:]]))
+
+    lo = hi = None
+    if 'valid_range' in attrs and np.size(var.valid_range) == 2:
+        lo, hi = np.ravel(cast(var.valid_range))
+    else:
+        if 'valid_min' in attrs:
+            lo = cast(var.valid_min)
+        if 'valid_max' in attrs:
+            hi = cast(var.valid_max)
+
+    # NaN never compares equal; it's NaN in the float block anyway
+    return [v for v in excluded if not (dtype.kind == 'f' and np.isnan(v))], lo, hi
+
+def read_raw_block(var, index):
+    """
+    Read a block of a variable's packed values as a float64 array with NaN
+    in place of invalid values.
+
+    Unlike read_block(), no masked array is built and the data isn't
+    unpacked: the exclusions netCDF4 would mask (see get_invalid_values())
+    are compared against the raw buffer and written into the one float64
+    copy, and scale_factor/add_offset are left for the caller to apply to
+    the reduced results, see ExtentAccumulator.unpack().
+
+    Args:
+        var (netCDF4.Variable): variable to read
+        index (tuple)         : tuple of slices, as from iter_blocks()
+
+    Returns:
+        numpy.ndarray
+    """
+
+    mask, scale = var.mask, var.scale
+    var.set_auto_maskandscale(False)
+    try:
+        data = np.asarray(var[index] if index else var[...])
+    finally:
+        var.set_auto_mask(mask)
+        var.set_auto_scale(scale)
+
+    if data.dtype.kind == 'i' and str(getattr(var, '_Unsigned', 'false')).lower() == 'true':
+        data = data.view(data.dtype.str.replace('i', 'u'))
+
+    excluded, lo, hi = get_invalid_values(var, data.dtype)
+    invalid = np.zeros(data.shape, dtype=bool)
+    for value in excluded:
+        invalid |= data == value
+    if lo is not None:
+        invalid |= data < lo
+    if hi is not None:
+        invalid |= data > hi
+
+    block = data.astype(np.float64, copy=False)
+    if invalid.any():
+        block[invalid] = np.nan
+    return block
+
+def unpack_values(values, var):
+    """
+    Unpack values read with read_raw_block(), in place.
+
+    Args:
+        values (numpy.ndarray): float64 packed values of `var`
+        var (netCDF4.Variable): variable they were read from
+
+    Returns:
+        numpy.ndarray, `values`
+    """
+
+    scale, offset = get_packing(var)
+    if scale != 1.0:
+        values *= scale
+    if offset != 0.0:
+        values += offset
+    return values
+
+class ExtentAccumulator(object):
+    """
+    Running reduction of a variable's min, max and mean spacing.
+
+    Spacing follows np.nanmean(np.diff(data)): differences are taken along
+    the last axis and any difference involving a missing value is ignored.
+    The same is kept for every other axis, see axis_spacing().
+    """
+
+    def __init__(self):
+        self.size = 0          # elements seen
+        self.count = 0         # non-NaN elements seen
+        self.min = np.inf
+        self.max = -np.inf
+        self.diff_sum = 0.0    # sum of non-NaN differences along the last axis
+        self.diff_count = 0    # number of non-NaN differences along the last axis
+        self.leading_diffs = []  # [sum, count] of differences along each other axis
+        self.head = None       # first record (a value if 1-D), to merge it later
+        self.tail = None       # last record (a value if 1-D), to extend it later
+        self.error = 0.0       # how far the true min and max may lie beyond min and max
+        self.source = "data"   # where the statistics came from
+
+    @property
+    def all_nan(self):
+        return self.count == 0
+
+    @property
+    def resolution(self):
+        if self.diff_count == 0:
+            return np.nan
+        return self.diff_sum / self.diff_count
+
+    def axis_spacing(self):
+        """
+        Mean spacing along each axis, NaN where no differences were seen.
+
+        Returns:
+            list of float, the last being `resolution`
+        """
+
+        return [s / c if c else np.nan for s, c in self.leading_diffs] + [self.resolution]
+
+    def to_dict(self):
+        return {
+            "size": int(self.size),
+            "count": int(self.count),
+            "min": float(self.min),
+            "max": float(self.max),
+            "diff_sum": float(self.diff_sum),
+            "diff_count": int(self.diff_count),
+            "leading_diffs": [[float(s), int(c)] for s, c in self.leading_diffs],
+            "tail": self.tail.tolist() if isinstance(self.tail, np.ndarray) else self.tail
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls()
+        for k, v in state.items():
+            setattr(acc, k, v)
+        if isinstance(acc.tail, list):
+            acc.tail = np.array(acc.tail, dtype=np.float64)
+        return acc
+
+    def merge(self, other):
+        """
+        Fold in the reduction of the data directly following this one's
+        along the first axis, e.g. the next range of records.
+
+        Args:
+            other (ExtentAccumulator): reduction to fold in
+
+        Returns:
+            None
+        """
+
+        # the differences across the boundary are missing from both
+        if self.tail is not None and other.head is not None:
+            if isinstance(other.head, np.ndarray):
+                self._add_diffs(other.head - self.tail, 0)
+            else:
+                self._add_diffs(np.array([other.head - self.tail]))
+
+        self.size += other.size
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.error = max(self.error, other.error)
+        self.diff_sum += other.diff_sum
+        self.diff_count += other.diff_count
+        for axis, (s, c) in enumerate(other.leading_diffs):
+            self._grow(axis + 1)
+            self.leading_diffs[axis][0] += s
+            self.leading_diffs[axis][1] += c
+        if self.head is None:
+            self.head = other.head
+        if other.tail is not None:
+            self.tail = other.tail
+
+    def unpack(self, scale, offset):
+        """
+        Turn a reduction of packed values into one of the unpacked values,
+        data * scale + offset, without touching the data again: the min and
+        max map to the ends of the unpacked range (swapped by a negative
+        scale), and differences only scale.
+
+        Args:
+            scale (float) : scale_factor
+            offset (float): add_offset
+
+        Returns:
+            None
+        """
+
+        if scale == 1.0 and offset == 0.0:
+            return
+        if self.count:
+            self.min, self.max = sorted((self.min * scale + offset, self.max * scale + offset))
+        self.error *= abs(scale)
+        self.diff_sum *= scale
+        for diffs in self.leading_diffs:
+            diffs[0] *= scale
+        if self.head is not None:
+            self.head = self.head * scale + offset
+        if self.tail is not None:
+            self.tail = self.tail * scale + offset
+
+    def _grow(self, axes):
+        while len(self.leading_diffs) < axes:
+            self.leading_diffs.append([0.0, 0])
+
+    def _add_diffs(self, diffs, axis=None):
+        valid = ~np.isnan(diffs)
+        total, n = float(diffs[valid].sum()), int(np.count_nonzero(valid))
+        if axis is None:
+            self.diff_sum += total
+            self.diff_count += n
+        else:
+            self._grow(axis + 1)
+            self.leading_diffs[axis][0] += total
+            self.leading_diffs[axis][1] += n
+
+    def update(self, block, edge=None, leading_edges=None):
+        """
+        Fold a block into the reduction.
+
+        Args:
+            block (numpy.ndarray): float block, NaN where missing
+            edge (numpy.ndarray) : last slice along the final axis of the
+                                   block preceding this one, if any
+            leading_edges (dict) : {axis: last slice along that axis of the
+                                   block preceding this one along it}, for
+                                   the other axes; default None
+
+        Returns:
+            None
+        """
+
+        self.size += block.size
+        valid = int(np.count_nonzero(~np.isnan(block)))
+        if valid:
+            self.count += valid
+            self.min = min(self.min, float(np.nanmin(block)))
+            self.max = max(self.max, float(np.nanmax(block)))
+
+        if block.ndim == 0 or block.shape[-1] == 0:
+            return
+        if edge is not None:
+            self._add_diffs(block[..., 0] - edge)
+        if block.shape[-1] > 1:
+            self._add_diffs(np.diff(block, axis=-1))
+
+        self._grow(block.ndim - 1)
+        for axis in range(block.ndim - 1):
+            if leading_edges and leading_edges.get(axis) is not None:
+                self._add_diffs(block.take(0, axis) - leading_edges[axis], axis)
+            if block.shape[axis] > 1:
+                self._add_diffs(np.diff(block, axis=axis), axis)
+
+def get_edge_axes(var, block, max_elements=MAX_BLOCK_ELEMENTS):
+    """
+    Pick the leading axes along which differences across blocks are kept.
+
+    Keeping them means holding the last slice of every block along the
+    axis until the next block along it is read, i.e. up to one
+    cross-section of the variable per axis. Axes are taken from the last
+    towards the first while those cross-sections fit in `max_elements` in
+    total; differences across blocks along any other axis are left out of
+    its spacing.
+
+    Args:
+        var (netCDF4.Variable): variable to read
+        block (list)          : block shape, see get_block_shape()
+        max_elements (int)    : budget for the cross-sections, in elements
+
+    Returns:
+        list of int
+    """
+
+    axes, budget = [], max_elements
+    for axis in reversed(range(var.ndim - 1)):
+        if block[axis] >= var.shape[axis]:
+            continue
+        section = var.size // var.shape[axis]
+        if axis == 0:
+            # the first and last records are kept as well, see scan_variable()
+            section *= 3
+        if section > budget:
+            break
+        axes.append(axis)
+        budget -= section
+    return axes
+
+def scan_variable(var, max_elements=MAX_BLOCK_ELEMENTS, read=read_raw_block, start=0, acc=None, stop=None):
+    """
+    Reduce a variable to its extent statistics in a single pass over its data.
+
+    Passing the accumulator of the first `start` records along the first
+    axis folds in only the records after them. Besides the blocks
+    themselves, at most `max_elements` are held to carry differences
+    across blocks, see get_edge_axes().
+
+    Args:
+        var (netCDF4.Variable) : variable to reduce
+        max_elements (int)     : maximum number of elements per read
+        read (callable)        : function reading a block, see read_raw_block()
+        start (int)            : first record to read; default 0
+        acc (ExtentAccumulator): reduction of the records before `start`
+        stop (int)             : record to stop before; default None, the end
+
+    Returns:
+        ExtentAccumulator
+    """
+
+    if acc is None:
+        acc = ExtentAccumulator()
+    stop = var.shape[0] if stop is None and var.ndim else stop
+    edge = acc.tail if start and var.ndim == 1 else None
+
+    # {axis: {starts along the other axes: (stop along axis, last slice)}}
+    block_shape = get_block_shape(var, max_elements)
+    edge_axes = get_edge_axes(var, block_shape, max_elements)
+    edges = dict((axis, {}) for axis in edge_axes)
+    # the first and last records, for merging or resuming along the first axis
+    records = var.ndim > 1 and (0 in edge_axes or block_shape[0] >= var.shape[0])
+    if records:
+        head = np.full(var.shape[1:], np.nan) if acc.size == 0 else None
+        tail = np.full(var.shape[1:], np.nan)
+
+    for index in iter_blocks(var, max_elements, start, stop):
+        # blocks along the last axis are consecutive; carry the trailing
+        # edge of one into the next so differences across them are kept
+        if index and index[-1].start == 0:
+            edge = None
+        block = read(var, index)
+
+        leading_edges = {}
+        for axis, saved in edges.items():
+            key = tuple(s.start for k, s in enumerate(index) if k != axis)
+            prev = saved.pop(key, None)
+            if prev is not None and prev[0] == index[axis].start:
+                leading_edges[axis] = prev[1]
+            if index[axis].stop < var.shape[axis]:
+                saved[key] = (index[axis].stop, block.take(-1, axis))
+        if records:
+            if start and index[0].start == start and isinstance(acc.tail, np.ndarray):
+                leading_edges[0] = acc.tail[index[1:]]
+            if head is not None and index[0].start == start:
+                head[index[1:]] = block[0]
+            if index[0].stop == stop:
+                tail[index[1:]] = block[-1]
+
+        if var.ndim == 1 and acc.size == 0 and block.size:
+            acc.head = float(block[0])
+        acc.update(block, edge, leading_edges)
+        if block.ndim:
+            edge = block[..., -1]
+
+    if var.ndim == 1 and edge is not None:
+        acc.tail = float(edge)
+    elif records:
+        if head is not None:
+            acc.head = head
+        acc.tail = tail
+    return acc
+
+def split_records(var, parts, max_elements=MAX_BLOCK_ELEMENTS):
+    """
+    Split the first axis of a variable into up to `parts` ranges of whole
+    blocks, see get_block_shape(), so that no chunk is read by two ranges.
+
+    Args:
+        var (netCDF4.Variable): variable to split
+        parts (int)           : maximum number of ranges
+        max_elements (int)    : maximum number of elements per block
+
+    Returns:
+        list of (start, stop)
+    """
+
+    if var.ndim == 0 or var.shape[0] == 0:
+        return []
+    starts = list(range(0, var.shape[0], get_block_shape(var, max_elements)[0]))
+    step = -(-len(starts) // parts)
+    bounds = starts[::step] + [var.shape[0]]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def scan_records(fpath, name, start, stop, max_elements=MAX_BLOCK_ELEMENTS, chunk_cache=None):
+    """
+    Reduce a range of records of a variable, opening the file anew so it can
+    run in a worker process.
+
+    Args:
+        fpath (str)       : path to local NetCDF file
+        name (str)        : variable name
+        start (int)       : first record to read
+        stop (int)        : record to stop before
+        max_elements (int): maximum number of elements per read
+        chunk_cache (int) : HDF5 chunk cache size in bytes; default None,
+                            the library's
+
+    Returns:
+        ExtentAccumulator
+    """
+
+    with netCDF4.Dataset(fpath) as nc:
+        var = nc.variables[name]
+        if chunk_cache is not None:
+            var.set_var_chunk_cache(size=chunk_cache)
+        return scan_variable(var, max_elements, start=start, stop=stop)
+
+class ParallelScanner(object):
+    """
+    Reduce variables of a local file in a pool of worker processes.
+
+    Each variable is split into ranges of whole chunks along its first axis
+    (see split_records()), which workers decompress and reduce on their own;
+    the partial reductions are then merged in order, so the result is the
+    same as scan_variable() gives. Processes rather than threads are used
+    because the HDF5 library serializes calls made from one process.
+    Variables which fit in a single block are scanned in this process.
+    """
+
+    def __init__(self, fpath, workers=None, max_elements=MAX_BLOCK_ELEMENTS, chunk_cache=None):
+        import concurrent.futures
+
+        self.fpath = fpath
+        self.max_elements = max_elements
+        self.chunk_cache = chunk_cache
+        workers = workers or os.cpu_count() or 1
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers)
+        # a few ranges per worker evens out chunks which compress unevenly
+        self.parts = 4 * workers
+
+    def scan(self, var):
+        """
+        Reduce a variable, see scan_variable().
+
+        Args:
+            var (netCDF4.Variable): variable of the file at `fpath`
+
+        Returns:
+            ExtentAccumulator
+        """
+
+        ranges = split_records(var, self.parts, self.max_elements)
+        if len(ranges) < 2:
+            return scan_variable(var, self.max_elements)
+
+        acc = ExtentAccumulator()
+        tasks = [(self.fpath, var.name, i, j, self.max_elements, self.chunk_cache) for i, j in ranges]
+        for part in self.pool.map(scan_records, *zip(*tasks)):
+            acc.merge(part)
+        return acc
+
+    def close(self):
+        self.pool.shutdown()
+
+def get_record_fingerprint(var, records, read=read_raw_block, samples=FINGERPRINT_RECORDS):
+    """
+    Hash `samples` evenly spaced records among the first `records` of a
+    variable, the first and last included, to tell whether records already
+    reduced have since been rewritten. Every record is hashed if there are
+    no more than `samples`; otherwise a rewrite touching none of the
+    sampled records goes unnoticed.
+
+    Args:
+        var (netCDF4.Variable): variable with an unlimited first dimension
+        records (int)         : number of records previously reduced
+        read (callable)       : function reading a block, see read_raw_block()
+        samples (int)         : number of records to hash
+
+    Returns:
+        str
+    """
+
+    rest = tuple(slice(0, n) for n in var.shape[1:])
+    sha1 = hashlib.sha1()
+    for i in np.unique(np.linspace(0, records - 1, min(records, samples)).round().astype(int)):
+        sha1.update(read(var, (slice(i, i + 1),) + rest).tobytes())
+    return sha1.hexdigest()
+
+class IncrementalState(object):
+    """
+    Per-variable reductions of a growing file, kept in an ExtentCache.
+    """
+
+    def __init__(self, cache, fpath):
+        self.cache = cache
+        self.fpath = fpath
+
+    def load(self, name):
+        return self.cache.get_increment(self.fpath, name)
+
+    def save(self, name, state):
+        self.cache.put_increment(self.fpath, name, state)
+
+def scan_incremental(var, increments, max_elements=MAX_BLOCK_ELEMENTS, read=read_raw_block):
+    """
+    Reduce a variable whose first dimension is unlimited, reading only the
+    records appended since the last call with the same `increments`.
+
+    The previous reduction is reused only if the record count hasn't
+    shrunk, the other dimensions are unchanged and a sample of the
+    previously reduced records still hash the same (see
+    get_record_fingerprint()); otherwise the whole variable is rescanned.
+
+    Args:
+        var (netCDF4.Variable)       : variable to reduce
+        increments (IncrementalState): stored reductions
+        max_elements (int)           : maximum number of elements per read
+        read (callable)              : function reading a block, see read_raw_block()
+
+    Returns:
+        ExtentAccumulator
+    """
+
+    records = var.shape[0]
+    state = increments.load(var.name)
+
+    start, acc = 0, None
+    if (state is not None
+            and 0 < state["records"] <= records
+            and state["shape"][1:] == list(var.shape[1:])
+            and state["fingerprint"] == get_record_fingerprint(var, state["records"], read)):
+        start = state["records"]
+        acc = ExtentAccumulator.from_dict(state["accumulator"])
+
+    acc = scan_variable(var, max_elements, read, start, acc)
+    if records:
+        increments.save(var.name, {
+            "records": records,
+            "shape": list(var.shape),
+            "fingerprint": get_record_fingerprint(var, records, read),
+            "accumulator": acc.to_dict()
+        })
+    return acc
+
+def is_coordinate_variable(var):
+    """
+    Check whether a variable is a 1-D coordinate variable, i.e. it has the
+    same name as its only dimension.
+
+    Args:
+        var (netCDF4.Variable): variable to check
+
+    Returns:
+        bool
+    """
+
+    return var.ndim == 1 and var.dimensions[0] == var.name
+
+def scan_monotonic(var, samples=MONOTONIC_SAMPLES, read=read_raw_block):
+    """
+    Reduce a 1-D variable from its endpoints and a sample of its interior.
+
+    CF coordinate variables are strictly monotonic and have no missing
+    values, so their min and max are the endpoints and the mean spacing is
+    (last - first) / (n - 1). The evenly spaced sample is only there to
+    confirm monotonicity; any NaN or change of direction in it means the
+    shortcut can't be trusted. The sample is one strided read plus the
+    last element, so it costs two requests against a remote dataset.
+
+    Args:
+        var (netCDF4.Variable): 1-D variable
+        samples (int)         : approximate number of elements to read
+        read (callable)       : function reading a block, see read_raw_block()
+
+    Returns:
+        ExtentAccumulator, or None if monotonicity can't be confirmed
+    """
+
+    n = var.shape[0]
+    if n <= samples:
+        return
+
+    step = (n - 1) // (samples - 1)
+    values = read(var, (slice(0, n, step),))
+    if (n - 1) % step:
+        values = np.append(values, read(var, (slice(n - 1, n),)))
+    if np.isnan(values).any():
+        return
+
+    steps = np.diff(values)
+    if not ((steps > 0).all() or (steps < 0).all()):
+        return
+
+    acc = ExtentAccumulator()
+    acc.source = "coordinate endpoints"
+    acc.size = acc.count = n
+    acc.min = float(min(values[0], values[-1]))
+    acc.max = float(max(values[0], values[-1]))
+    acc.diff_sum = float(values[-1] - values[0])
+    acc.diff_count = n - 1
+    return acc
+
+def scan_sampled(var, samples=APPROX_SAMPLES, read=read_raw_block):
+    """
+    Estimate a variable's extent statistics from a lattice of its elements.
+
+    The lattice is strided evenly along each axis and always takes in the
+    first and last index of every axis, so the corners and faces of the
+    array, where coordinate grids have their extremes, are sampled. Its
+    min and max are reported with `error` set to the largest difference
+    between neighbouring samples, which bounds how far the true extremes
+    lie beyond them for data varying no faster between samples than
+    across them. The mean spacing along an axis telescopes to
+    (last - first) / (n - 1) on every line along it, so it is exact on the
+    lines through the lattice and estimated from them. Variables small
+    enough to be read whole are scanned exactly.
+
+    Args:
+        var (netCDF4.Variable): variable to sample
+        samples (int)         : approximate number of elements to read
+        read (callable)       : function reading a block, see read_raw_block()
+
+    Returns:
+        ExtentAccumulator
+    """
+
+    if var.ndim == 0 or var.size <= samples:
+        return scan_variable(var, read=read)
+
+    # per axis: (source, destination) slices of the reads, lattice length
+    per_axis = max(int(samples ** (1.0 / var.ndim)), 2)
+    axes = []
+    for n in var.shape:
+        step = max(-(-(n - 1) // (per_axis - 1)), 1)
+        m = len(range(0, n, step))
+        parts = [(slice(0, n, step), slice(0, m))]
+        if (n - 1) % step:
+            parts.append((slice(n - 1, n), slice(m, m + 1)))
+            m += 1
+        axes.append((parts, m))
+
+    lattice = np.empty([m for _, m in axes])
+    for combo in itertools.product(*[parts for parts, _ in axes]):
+        lattice[tuple(dst for _, dst in combo)] = read(var, tuple(src for src, _ in combo))
+
+    acc = ExtentAccumulator()
+    acc.source = "a sample of {} values".format(lattice.size)
+    acc.size = var.size
+    valid = int(np.count_nonzero(~np.isnan(lattice)))
+    if valid:
+        acc.count = max(int(round(valid / lattice.size * var.size)), 1)
+        acc.min = float(np.nanmin(lattice))
+        acc.max = float(np.nanmax(lattice))
+
+    for axis, n in enumerate(var.shape):
+        if n > 1:
+            diffs = np.abs(np.diff(lattice, axis=axis))
+            if not np.isnan(diffs).all():
+                acc.error = max(acc.error, float(np.nanmax(diffs)))
+
+        ends = lattice.take(-1, axis) - lattice.take(0, axis)
+        ends = ends[~np.isnan(ends)]
+        if axis == var.ndim - 1:
+            acc.diff_sum, acc.diff_count = float(ends.sum()), ends.size * (n - 1)
+        else:
+            acc.leading_diffs.append([float(ends.sum()), ends.size * (n - 1)])
+
+    return acc
+
+def header_extent(nc, var, read=read_raw_block):
+    """
+    Derive a variable's extent from its attributes instead of its data.
+
+    In order of preference the range comes from `actual_range`, the first
+    and last cells of a `bounds` variable, `valid_min`/`valid_max` or
+    `valid_range`. The last two are only limits on valid values, so
+    compute_geo_extents() prefers existing global attributes to them. The
+    spacing is only known for 1-D variables with an actual range, which
+    are assumed to be evenly spaced over it.
 
     Args:
         nc (netCDF4.Dataset)  : open Dataset
-        possible_units (tuple): possible unit names for the extent
-        std_name (str)        : standard name of the extent
-        axis_name (str)       : name of the axis the extent maps to
-        short_name (str)      : abbreviated name of the extent
+        var (netCDF4.Variable): variable to describe
+        read (callable)       : function reading a block, see read_raw_block()
+
+    Returns:
+        ExtentAccumulator, or None if the attributes don't give a range
+    """
+
+    attrs = var.ncattrs()
+    cells = var.size - 1
+    source = None
+    # a range attribute without exactly two values is taken as absent
+    if 'actual_range' in attrs and np.size(var.actual_range) == 2:
+        lo, hi = np.ravel(var.actual_range)
+        source = "actual_range"
+    elif 'bounds' in attrs and var.ndim == 1 and var.bounds in nc.variables:
+        # only the outermost cells are read
+        bounds = nc.variables[var.bounds]
+        ends = np.concatenate([
+            read(bounds, (slice(0, 1),)).ravel(),
+            read(bounds, (slice(bounds.shape[0] - 1, None),)).ravel()
+        ])
+        if not np.isnan(ends).any():
+            ends = unpack_values(ends, bounds)
+            lo, hi = ends.min(), ends.max()
+            cells = var.size
+            source = "bounds variable {}".format(var.bounds)
+
+    # limits on valid values are the last resort
+    if source is None:
+        if 'valid_min' in attrs and 'valid_max' in attrs:
+            lo, hi = var.valid_min, var.valid_max
+            source = "valid_min/valid_max"
+        elif 'valid_range' in attrs and np.size(var.valid_range) == 2:
+            lo, hi = np.ravel(var.valid_range)
+            source = "valid_range"
+        else:
+            return
+
+    # valid_* are stored packed
+    if source.startswith("valid"):
+        scale = getattr(var, 'scale_factor', 1.0)
+        offset = getattr(var, 'add_offset', 0.0)
+        lo, hi = sorted((lo * scale + offset, hi * scale + offset))
+
+    acc = ExtentAccumulator()
+    acc.source = source
+    acc.size = acc.count = var.size
+    acc.min = float(lo)
+    acc.max = float(hi)
+    if var.ndim == 1 and cells > 0 and not is_validity_limit(acc):
+        acc.diff_sum = acc.max - acc.min
+        acc.diff_count = cells
+    return acc
+
+def is_validity_limit(acc):
+    """
+    Check whether attribute-derived statistics only give the limits of
+    valid values (valid_min/valid_max or valid_range), not an extent.
+
+    Args:
+        acc (ExtentAccumulator): see header_extent()
+
+    Returns:
+        bool
+    """
+
+    return acc.source.startswith("valid")
+
+def get_global_extent(nc, short_name):
+    """
+    Read an extent from existing geospatial_* global attributes.
+
+    Args:
+        nc (netCDF4.Dataset): open Dataset
+        short_name (str)    : abbreviated name of the extent
+
+    Returns:
+        dict of min, max, resolution and units (the last two may be None),
+        or None if the min and max aren't both set
+    """
+
+    attrs = nc.ncattrs()
+    prefix = "geospatial_{}_".format(short_name)
+    if prefix + "min" not in attrs or prefix + "max" not in attrs:
+        return
+
+    return {
+        "min": float(nc.getncattr(prefix + "min")),
+        "max": float(nc.getncattr(prefix + "max")),
+        "resolution": nc.getncattr(prefix + "resolution") if prefix + "resolution" in attrs else None,
+        "units": nc.getncattr(prefix + "units") if prefix + "units" in attrs else None
+    }
+
+def print_geo_attributes(short_name, geo_min, geo_max, geo_res, geo_units, sources=None, positive=None, axis_spacing=None, error=0.0):
+    """
+    Print the <attribute> tags for one extent.
+
+    Args:
+        short_name (str): abbreviated name of the extent
+        geo_min (float) : minimum
+        geo_max (float) : maximum
+        geo_res (str)   : resolution with units; not printed if None
+        geo_units (str) : units
+        sources (dict)  : optional {attribute suffix: source description},
+                          printed as comments before the tags
+        positive (str)  : direction of a vertical extent; not printed if None
+        axis_spacing (dict): optional {dimension: mean spacing}, printed as a
+                          comment before the tags
+        error (float)   : bound on how far the true min and max lie beyond
+                          geo_min and geo_max; printed as a comment if not 0
+
+    Returns:
+        None
+    """
+
+    for suffix, source in (sources or {}).items():
+        print('<!-- geospatial_{}_{} from {} -->'.format(short_name, suffix, source))
+    if error:
+        print('<!-- geospatial_{0}_min and geospatial_{0}_max within {1} {2} -->'.format(short_name, error, geo_units))
+    if axis_spacing:
+        print('<!-- geospatial_{}_resolution by dimension: {} -->'.format(
+            short_name, ", ".join("{} {}".format(dim, res) for dim, res in axis_spacing.items())))
+
+    print('<attribute name="geospatial_{}_min" value="{}" />'.format(short_name, geo_min))
+    print('<attribute name="geospatial_{}_max" value="{}" />'.format(short_name, geo_max))
+    if geo_res is not None:
+        print('<attribute name="geospatial_{}_resolution" value="{}" />'.format(short_name, geo_res))
+    print('<attribute name="geospatial_{}_units" value="{}" />'.format(short_name, geo_units))
+    if positive is not None:
+        print('<attribute name="geospatial_{}_positive" value="{}" />'.format(short_name, positive))
+
+def format_iso_duration(seconds):
+    """
+    Format a number of seconds as an ISO 8601 duration, e.g. P1DT6H.
+
+    Args:
+        seconds (float): duration
+
+    Returns:
+        str
+    """
+
+    days, rem = divmod(abs(seconds), 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, secs = divmod(rem, 60)
+    secs = round(secs, 3)
+
+    out = "P" + ("{}D".format(int(days)) if days else "")
+    clock = "".join([
+        "{}H".format(int(hours)) if hours else "",
+        "{}M".format(int(minutes)) if minutes else "",
+        "{:g}S".format(secs) if secs else ""
+    ])
+    if clock:
+        out += "T" + clock
+    return out if out != "P" else "PT0S"
+
+def print_time_coverage(coverage):
+    """
+    Print the time_coverage_* <attribute> tags.
+
+    Args:
+        coverage (dict): see compute_time_coverage()
+
+    Returns:
+        None
+    """
+
+    for suffix, source in (coverage["sources"] or {}).items():
+        print('<!-- time_coverage_{} from {} -->'.format(suffix, source))
+
+    for suffix in ("start", "end", "duration", "resolution"):
+        if coverage[suffix] is not None:
+            print('<attribute name="time_coverage_{}" value="{}" />'.format(suffix, coverage[suffix]))
+
+def is_remote(fpath):
+    """
+    Check whether a dataset path is an OPeNDAP URL.
+
+    Args:
+        fpath (str): path or URL
+
+    Returns:
+        bool
+    """
+
+    return fpath.startswith(('http://', 'https://'))
+
+def get_constraint_expression(var, index):
+    """
+    Render a block read as a DAP2 constraint expression, e.g. lat[0:1:179].
+
+    Args:
+        var (netCDF4.Variable): variable being read
+        index (tuple)         : tuple of slices
+
+    Returns:
+        str
+    """
+
+    hyperslabs = []
+    for s, n in zip(index, var.shape):
+        start, stop, step = s.indices(n)
+        hyperslabs.append("[{}:{}:{}]".format(start, step, max(stop - 1, start)))
+    return var.name + "".join(hyperslabs)
+
+class DapResponseCache(object):
+    """
+    On-disk cache of block reads from a remote dataset.
+
+    Entries are keyed by the dataset URL, the constraint expression of
+    the read and the function reading it (raw and unpacked blocks differ),
+    and stored as .npy files under `cache_dir`.
+    """
+
+    def __init__(self, url, cache_dir=os.path.join(CACHE_DIR, 'dap'), read=read_raw_block):
+        self.url = url
+        self.cache_dir = cache_dir
+        self.read_uncached = read
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, var, index):
+        key = "{}?{}#{}".format(self.url, get_constraint_expression(var, index), self.read_uncached.__name__)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+
+    def read(self, var, index):
+        """
+        Drop-in replacement for `read` which checks the cache first.
+
+        Args:
+            var (netCDF4.Variable): variable to read
+            index (tuple)         : tuple of slices
+
+        Returns:
+            numpy.ndarray
+        """
+
+        path = self.path(var, index)
+        if os.path.exists(path):
+            return np.load(path)
+
+        data = self.read_uncached(var, index)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, 'wb') as fp:
+            np.save(fp, data)
+        os.replace(tmp_path, path)
+        return data
+
+def count_chunks(index, shape, chunks):
+    """
+    Count the chunks a read of a chunked variable touches.
+
+    Args:
+        index (tuple): tuple of slices, one per axis
+        shape (tuple): variable shape
+        chunks (list): chunk shape
+
+    Returns:
+        int
+    """
+
+    total = 1
+    for s, n, c in zip(index, shape, chunks):
+        start, stop, step = s.indices(n)
+        k = len(range(start, stop, step))
+        if k == 0:
+            return 0
+        # strides of a chunk or more land in a new chunk every time;
+        # shorter ones touch every chunk from the first to the last
+        total *= k if step >= c else (start + (k - 1) * step) // c - start // c + 1
+    return total
+
+class Profiler(object):
+    """
+    Wall time per phase of describing a dataset and, per variable, the time
+    spent reducing it and the reads made of it.
+
+    Bytes decompressed are estimated as the whole chunks each read touches,
+    as if none were held in the HDF5 chunk cache; for contiguous and remote
+    variables they equal the bytes requested. Reads made in worker
+    processes (see ParallelScanner) are counted but not timed.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.variables = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def variable(self, name):
+        return self.variables.setdefault(name, {
+            "seconds": 0.0,
+            "read_seconds": 0.0,
+            "reads": 0,
+            "bytes_requested": 0,
+            "bytes_decompressed": 0,
+            "source": None
+        })
+
+    @contextlib.contextmanager
+    def reducing(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.variable(name)["seconds"] += time.perf_counter() - start
+
+    def count_read(self, var, index, seconds=0.0):
+        """
+        Account for one read of a variable.
+
+        Args:
+            var (netCDF4.Variable): variable read
+            index (tuple)         : tuple of slices, possibly fewer than
+                                    the variable has axes
+            seconds (float)       : time the read took
+
+        Returns:
+            None
+        """
+
+        index = tuple(index or ()) + (slice(None),) * (var.ndim - len(index or ()))
+        elements = 1
+        for s, n in zip(index, var.shape):
+            elements *= len(range(*s.indices(n)))
+
+        requested = elements * var.dtype.itemsize
+        chunking = var.chunking()
+        if isinstance(chunking, list):
+            chunk_elements = 1
+            for c in chunking:
+                chunk_elements *= c
+            decompressed = count_chunks(index, var.shape, chunking) * chunk_elements * var.dtype.itemsize
+        else:
+            decompressed = requested
+
+        stats = self.variable(var.name)
+        stats["reads"] += 1
+        stats["read_seconds"] += seconds
+        stats["bytes_requested"] += requested
+        stats["bytes_decompressed"] += decompressed
+
+    def wrap(self, read):
+        """
+        Wrap a function reading a block, see read_raw_block(), so its reads
+        are counted.
+
+        Returns:
+            callable
+        """
+
+        def profiled_read(var, index):
+            start = time.perf_counter()
+            data = read(var, index)
+            self.count_read(var, index, time.perf_counter() - start)
+            return data
+        return profiled_read
+
+    def report(self):
+        """
+        Returns:
+            dict of phases ({phase: seconds}) and variables ({name: dict of
+            seconds, read_seconds, reads, bytes_requested, bytes_decompressed
+            and the source of its statistics}), slowest first
+        """
+
+        variables = sorted(self.variables.items(), key=lambda x: x[1]["seconds"] + x[1]["read_seconds"], reverse=True)
+        return {
+            "phases": dict((k, round(v, 6)) for k, v in self.phases.items()),
+            "variables": dict(
+                (name, dict(stats, seconds=round(stats["seconds"], 6), read_seconds=round(stats["read_seconds"], 6)))
+                for name, stats in variables
+            )
+        }
+
+class ExtentStatsTable(object):
+    """
+    Extent statistics for the variables of one open dataset.
+
+    Each variable is scanned the first time it is asked for and the result
+    is kept, so every axis pass over the same dataset shares the reads.
+    Coordinate variables are reduced from a handful of elements when they
+    can be shown to be monotonic, see scan_monotonic(). With `header_only`
+    set, ranges given by attributes are used before any data is read, see
+    header_extent(). Given `increments`, variables along an unlimited first
+    dimension only have their new records read, see scan_incremental().
+    All reads go through `read`, see read_raw_block(), except full scans
+    handed to a `scanner`, see ParallelScanner; either way the reductions
+    are of packed values, unpacked once at the end, see
+    ExtentAccumulator.unpack(). With `approx` set, any other variable is
+    estimated from a sample, see scan_sampled(). Given `chunk_cache`, the
+    HDF5 chunk cache of each variable is resized to that many bytes before
+    it is read. Given a `profiler`, reads and reductions are accounted to
+    it, see Profiler.
+    """
+
+    def __init__(self, nc, max_elements=MAX_BLOCK_ELEMENTS, header_only=False, read=read_raw_block, increments=None, scanner=None, chunk_cache=None, approx=False, profiler=None):
+        self.nc = nc
+        self.max_elements = max_elements
+        self.header_only = header_only
+        self.approx = approx
+        self.read = profiler.wrap(read) if profiler is not None else read
+        self.increments = increments
+        self.scanner = scanner
+        self.chunk_cache = chunk_cache
+        self.profiler = profiler
+        self._stats = {}
+        self._headers = {}
+        self._unit_vars = None
+
+    def __getitem__(self, name):
+        if name not in self._stats:
+            self._stats[name] = self.compute(name)
+        return self._stats[name]
+
+    def __contains__(self, name):
+        return name in self._stats
+
+    def compute(self, name):
+        """
+        Scan a variable; called once per variable by __getitem__.
+
+        Args:
+            name (str): variable name
+
+        Returns:
+            ExtentAccumulator
+        """
+
+        var = self.nc.variables[name]
+        if self.header_only and self.header(name) is not None:
+            return self.header(name)
+
+        if self.profiler is None:
+            acc = self.scan(var)
+        else:
+            with self.profiler.reducing(name):
+                acc = self.scan(var)
+            self.profiler.variable(name)["source"] = acc.source
+        acc.unpack(*get_packing(var))
+        return acc
+
+    def scan(self, var):
+        """
+        Reduce a variable's packed values, see compute().
+
+        Args:
+            var (netCDF4.Variable): variable to reduce
+
+        Returns:
+            ExtentAccumulator
+        """
+
+        if self.chunk_cache is not None:
+            var.set_var_chunk_cache(size=self.chunk_cache)
+
+        if is_coordinate_variable(var):
+            acc = scan_monotonic(var, read=self.read)
+            if acc is not None:
+                return acc
+
+        if self.approx:
+            return scan_sampled(var, read=self.read)
+
+        if self.increments is not None and var.ndim and self.nc.dimensions[var.dimensions[0]].isunlimited():
+            return scan_incremental(var, self.increments, self.max_elements, self.read)
+
+        if self.scanner is not None:
+            if self.profiler is not None:
+                for index in iter_blocks(var, self.scanner.max_elements):
+                    self.profiler.count_read(var, index)
+            return self.scanner.scan(var)
+        return scan_variable(var, self.max_elements, self.read)
+
+    def header(self, name):
+        """
+        Attribute-derived statistics for a variable, see header_extent().
+
+        Args:
+            name (str): variable name
+
+        Returns:
+            ExtentAccumulator or None
+        """
+
+        if name not in self._headers:
+            self._headers[name] = header_extent(self.nc, self.nc.variables[name], self.read)
+        return self._headers[name]
+
+    def variables_with_units(self):
+        """
+        Variables carrying a units attribute, looked up once per dataset.
+
+        Returns:
+            list of netCDF4.Variable
+        """
+
+        if self._unit_vars is None:
+            self._unit_vars = self.nc.get_variables_by_attributes(units=lambda x: x is not None)
+        return self._unit_vars
+
+def matches(value, accepted):
+    """
+    Check a value against a name, a tuple of names or a predicate.
+
+    Args:
+        value (any)                     : value to check
+        accepted (str, tuple, callable) : accepted value(s)
+
+    Returns:
+        bool
+    """
+
+    if callable(accepted):
+        return accepted(value)
+    if isinstance(accepted, str):
+        return value == accepted
+    return value in accepted
+
+def score_candidates(stats, possible_units, std_name, axis_name, short_name, min_score=1):
+    """
+    Score the variables with units on how well they match an extent: one
+    point each for the units, standard name, axis and variable name.
+
+    Args:
+        stats (ExtentStatsTable): statistics table of the dataset
+        possible_units (tuple)  : possible unit names for the extent
+        std_name (str)          : standard name of the extent
+        axis_name (str)         : name of the axis the extent maps to
+        short_name (str)        : abbreviated name of the extent
+        min_score (int)         : score a variable needs to be kept; default 1
+
+    Returns:
+        dict of {variable name: score}, in variable order
+    """
+
+    geo_extent_vars = {}
+
+    # variables must have units
+    for var in stats.variables_with_units():
+
+        geo_extent_vars[var.name] = 0
+        # units in this set
+        if matches(var.units, possible_units):
+            geo_extent_vars[var.name] += 1
+
+        # standard name
+        if hasattr(var, 'standard_name') and matches(var.standard_name, std_name):
+            geo_extent_vars[var.name] += 1
+
+        # axis of "X"
+        if hasattr(var, 'axis') and var.axis == axis_name:
+            geo_extent_vars[var.name] += 1
+
+        if matches(var.name, std_name) or var.name == short_name:
+            geo_extent_vars[var.name] += 1
+
+    # filter out any low scores
+    return dict(filter(lambda x: x[1] >= min_score, geo_extent_vars.items()))
+
+def get_unit_conversion(var, reference):
+    """
+    Linear conversion of a variable's values to the units of another, e.g.
+    km to m, or days since one date to seconds since another (with the
+    same calendar).
+
+    Args:
+        var (netCDF4.Variable)      : variable to convert
+        reference (netCDF4.Variable): variable whose units to convert to
+
+    Returns:
+        (scale, offset) taking values of `var` to values * scale + offset
+        in the units of `reference`, or None if they can't be converted
+    """
+
+    return convert_units(var.units, reference.units, getattr(var, 'calendar', 'standard'), getattr(reference, 'calendar', 'standard'))
+
+def convert_units(units, ref_units, calendar='standard', ref_calendar='standard'):
+    """
+    Linear conversion between two units, see get_unit_conversion().
+
+    Args:
+        units (str)       : units to convert from
+        ref_units (str)   : units to convert to
+        calendar (str)    : calendar of `units`, if time units
+        ref_calendar (str): calendar of `ref_units`, if time units
+
+    Returns:
+        (scale, offset), or None if they can't be converted
+    """
+
+    units, ref_units = units.strip(), ref_units.strip()
+    if is_time_units(units) or is_time_units(ref_units):
+        calendars = [c.lower().replace('gregorian', 'standard') for c in (calendar, ref_calendar)]
+        if not is_time_units(units) or not is_time_units(ref_units) or calendars[0] != calendars[1]:
+            return
+        if units == ref_units:
+            return 1.0, 0.0
+
+        import cftime
+        try:
+            zero, one = cftime.date2num(cftime.num2date([0, 1], units, calendars[0]), ref_units, calendars[0])
+        except (ValueError, TypeError):
+            # e.g. months since, outside a 360-day calendar
+            return
+        return float(one - zero), float(zero)
+
+    if units == ref_units:
+        return 1.0, 0.0
+    if units in UNIT_CONVERSIONS and ref_units in UNIT_CONVERSIONS:
+        (base, factor), (ref_base, ref_factor) = UNIT_CONVERSIONS[units], UNIT_CONVERSIONS[ref_units]
+        if base == ref_base:
+            return factor / ref_factor, 0.0
+
+def compute_geo_extents(nc, possible_units, std_name, axis_name, short_name, stats=None, min_score=1):
+    """
+    Compute the geospatial extents for a NetCDF file, if available.
+
+    Args:
+        nc (netCDF4.Dataset)    : open Dataset
+        possible_units (tuple)  : possible unit names for the extent
+        std_name (str)          : standard name of the extent
+        axis_name (str)         : name of the axis the extent maps to
+        short_name (str)        : abbreviated name of the extent
+        stats (ExtentStatsTable): statistics shared between calls on the
+                                  same dataset; a new table if None
+        min_score (int)         : see score_candidates(); default 1
+
+    Returns:
+        dict of min, max, resolution (with units, or None), spacing (the
+        unrounded resolution, or None), axis_spacing ({dimension: mean
+        spacing} of the best multi-dimensional candidate, or None), error
+        (bound on how far the true min and max lie beyond min and max; 0
+        unless approximate), units, sources (None unless header-only or
+        approximate), partial (see merge_partials()) and, for a Z axis,
+        positive; or None if no variable matches
+    """
+
+    if stats is None:
+        stats = ExtentStatsTable(nc)
+
+    geo_extent_vars = score_candidates(stats, possible_units, std_name, axis_name, short_name, min_score)
+    if len(geo_extent_vars) == 0:
+        return
+
+    # sort by criteria passed
+    final_geo_vars = sorted(geo_extent_vars, key=lambda x: geo_extent_vars[x], reverse=True)
+
+    reference = nc.variables[final_geo_vars[0]]
+    geo_extent_units = reference.units
+
+    # existing global attributes spare a scan of any candidate whose own
+    # attributes don't give its range, and beat mere validity limits
+    if stats.header_only and any(stats.header(var) is None or is_validity_limit(stats.header(var)) for var in final_geo_vars):
+        global_extent = get_global_extent(nc, short_name)
+        if global_extent is not None:
+            geo_res = global_extent["resolution"]
+            if isinstance(geo_res, (int, float, np.number)):
+                geo_res = "{} {}".format(round(float(geo_res), 5), global_extent["units"] or geo_extent_units)
+            extent = {
+                "min": round(global_extent["min"], 5),
+                "max": round(global_extent["max"], 5),
+                "resolution": geo_res,
+                "spacing": None,
+                "axis_spacing": None,
+                "error": 0.0,
+                "units": global_extent["units"] or geo_extent_units,
+                "sources": {"min": "global attributes", "max": "global attributes"},
+                "partial": {
+                    "min": float(global_extent["min"]),
+                    "max": float(global_extent["max"]),
+                    "count": 0,
+                    "diff_sum": 0.0,
+                    "diff_count": 0
+                }
+            }
+            if axis_name == "Z":
+                extent["positive"] = get_vertical_positive(nc.variables[final_geo_vars[0]])
+            return extent
+
+    # at most one pass over each candidate, shared with the other axes;
+    # candidates in other units than the best one's are converted to them,
+    # or left out where they can't be
+    scanned = []
+    for var in final_geo_vars:
+        acc = stats[var]
+        conversion = get_unit_conversion(nc.variables[var], reference)
+        if acc.all_nan or conversion is None:
+            continue
+        if conversion != (1.0, 0.0):
+            # the table's accumulator is shared with the other axes
+            acc = copy.deepcopy(acc)
+            acc.unpack(*conversion)
+        scanned.append((var, acc))
+    if len(scanned) == 0:
+        return
+
+    obs_mins = [acc.min for var, acc in scanned]
+    obs_maxs = [acc.max for var, acc in scanned]
+
+    # candidates without any spacing (scalars, or attributes of
+    # multi-dimensional variables) don't count towards the resolution
+    obs_res = [acc.resolution for var, acc in scanned if not np.isnan(acc.resolution)]
+    if len(obs_res) == 0 and reference.size == 1:
+        obs_res = [0.0]
+
+    geo_min = round(float(min(obs_mins)), 5)
+    geo_max = round(float(max(obs_maxs)), 5)
+    geo_res = "{} {}".format(round(float(abs(np.mean(obs_res))), 5), geo_extent_units) if obs_res else None
+
+    sources = None
+    if stats.header_only or stats.approx:
+        describe = lambda i: "{} of {}".format(scanned[i][1].source, scanned[i][0])
+        sources = {
+            "min": describe(int(np.argmin(obs_mins))),
+            "max": describe(int(np.argmax(obs_maxs)))
+        }
+        spaced = [i for i, (var, acc) in enumerate(scanned) if not np.isnan(acc.resolution)]
+        if geo_res is not None:
+            sources["resolution"] = ", ".join(sorted(set(describe(i) for i in spaced or [0])))
+
+    # a curvilinear grid's spacing differs along each of its dimensions
+    axis_spacing = None
+    for var, acc in scanned:
+        dims = nc.variables[var].dimensions
+        if len(dims) > 1 and len(acc.axis_spacing()) == len(dims):
+            axis_spacing = dict(
+                (dim, None if np.isnan(res) else round(float(res), 5))
+                for dim, res in zip(dims, acc.axis_spacing())
+            )
+            break
+
+    spacing = float(abs(np.mean(obs_res))) if obs_res else np.nan
+    extent = {
+        "min": geo_min,
+        "max": geo_max,
+        "resolution": geo_res,
+        "spacing": None if np.isnan(spacing) else spacing,
+        "axis_spacing": axis_spacing,
+        "error": round(max(acc.error for var, acc in scanned), 5),
+        "units": geo_extent_units,
+        "sources": sources,
+        # unrounded sums to merge with other files', see merge_partials()
+        "partial": {
+            "min": float(min(obs_mins)),
+            "max": float(max(obs_maxs)),
+            "count": sum(int(acc.count) for var, acc in scanned),
+            "diff_sum": sum(abs(float(acc.diff_sum)) for var, acc in scanned),
+            "diff_count": sum(int(acc.diff_count) for var, acc in scanned)
+        }
+    }
+    if axis_name == "Z":
+        extent["positive"] = get_vertical_positive(nc.variables[final_geo_vars[0]])
+    return extent
+
+def get_vertical_positive(var):
+    """
+    Direction of increasing values of a vertical coordinate: its `positive`
+    attribute, else "down" for depths and "up" otherwise.
+
+    Args:
+        var (netCDF4.Variable): vertical coordinate variable
+
+    Returns:
+        str
+    """
+
+    if hasattr(var, 'positive'):
+        return var.positive
+    return "down" if getattr(var, 'standard_name', None) == "depth" else "up"
+
+def compute_time_coverage(nc, possible_units, std_name, axis_name, short_name, stats=None, min_score=1):
+    """
+    Compute the time coverage of a NetCDF file, if available.
+
+    The time extent is found like a geospatial one (see
+    compute_geo_extents()), and only its endpoints and mean spacing are
+    decoded with cftime, using the units and calendar of the first matching
+    variable.
+
+    Args:
+        see compute_geo_extents()
+
+    Returns:
+        dict of start, end, duration and resolution (ISO 8601) and
+        seconds_per_unit, plus the fields of the underlying extent; or None
+        if no variable matches
+    """
+
+    extent = compute_geo_extents(nc, possible_units, std_name, axis_name, short_name, stats, min_score)
+    if extent is None or not is_time_units(extent["units"]):
+        return
+
+    import cftime
+
+    calendar = 'standard'
+    for var in (stats or ExtentStatsTable(nc)).variables_with_units():
+        if var.units == extent["units"]:
+            calendar = getattr(var, 'calendar', 'standard')
+            break
+
+    start, end = cftime.num2date([extent["min"], extent["max"]], extent["units"], calendar)
+    zero, one = cftime.num2date([0, 1], extent["units"], calendar)
+    resolution = None
+    if extent["spacing"] is not None:
+        zero, step = cftime.num2date([0, extent["spacing"]], extent["units"], calendar)
+        resolution = format_iso_duration((step - zero).total_seconds())
+
+    sources = None
+    if extent["sources"]:
+        sources = {"start": extent["sources"].get("min"), "end": extent["sources"].get("max")}
+        sources = dict((k, v) for k, v in sources.items() if v)
+
+    return dict(extent, **{
+        "start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "end": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration": format_iso_duration((end - start).total_seconds()),
+        "resolution": resolution,
+        "seconds_per_unit": (one - zero).total_seconds(),
+        "sources": sources
+    })
+
+def get_geo_extents(nc, possible_units, std_name, axis_name, short_name, stats=None, min_score=1):
+    """
+    Get the geospatial extents for a NetCDF file, if available, and print
+    them as <attribute> tags. See compute_geo_extents().
+
+    Returns:
+        None
+    """
+
+    extent = compute_geo_extents(nc, possible_units, std_name, axis_name, short_name, stats, min_score)
+    if extent is None:
+        return
+
+    print_geo_attributes(
+        short_name,
+        extent["min"],
+        extent["max"],
+        extent["resolution"],
+        extent["units"],
+        extent["sources"],
+        extent.get("positive"),
+        extent.get("axis_spacing"),
+        extent.get("error", 0.0)
+    )
+
+def cross(o, a, b):
+    """
+    z component of (a - o) x (b - o), positive if o -> a -> b turns left.
+    """
+
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def convex_hull(points):
+    """
+    Convex hull of points by Andrew's monotone chain.
+
+    Args:
+        points (numpy.ndarray): (n, 2) array of x, y
+
+    Returns:
+        numpy.ndarray of the hull's vertices, counter-clockwise; fewer than
+        3 if the points are all equal or collinear
+    """
+
+    points = np.unique(points, axis=0)
+    if len(points) < 3:
+        return points
+
+    def half(seq):
+        chain = []
+        for p in seq:
+            while len(chain) >= 2 and cross(chain[-2], chain[-1], p) <= 0:
+                chain.pop()
+            chain.append(p)
+        return chain
+
+    points = points.tolist()
+    return np.array(half(points)[:-1] + half(reversed(points))[:-1])
+
+def drop_interior_points(points):
+    """
+    Drop points strictly inside the polygon of the extreme points along x,
+    y, x + y and x - y (Akl-Toussaint), which can't be hull vertices, so
+    the monotone chain only sees the few near the boundary.
+
+    Args:
+        points (numpy.ndarray): (n, 2) array of x, y
+
+    Returns:
+        numpy.ndarray
+    """
+
+    if len(points) < 16:
+        return points
+
+    x, y = points[:, 0], points[:, 1]
+    extremes = [np.argmin(x), np.argmin(x + y), np.argmin(y), np.argmax(x - y),
+                np.argmax(x), np.argmax(x + y), np.argmax(y), np.argmin(x - y)]
+    octagon = convex_hull(points[extremes])
+    if len(octagon) < 3:
+        return points
+
+    inside = np.ones(len(points), dtype=bool)
+    for a, b in zip(octagon, np.roll(octagon, -1, axis=0)):
+        inside &= (b[0] - a[0]) * (y - a[1]) - (b[1] - a[1]) * (x - a[0]) > 0
+    return points[~inside]
+
+def simplify_hull(hull, max_vertices=BOUNDS_MAX_VERTICES):
+    """
+    Cut a convex polygon down to a vertex budget while still enclosing it.
+
+    Each step replaces an edge b-c by extending its neighbours a-b and d-c
+    until they meet, choosing the edge whose replacement adds the least
+    area; edges whose neighbours diverge are left alone. Edges sharing no
+    vertex can be replaced independently, so far over budget a step
+    replaces those among the cheapest half of the excess.
+
+    Args:
+        hull (numpy.ndarray): counter-clockwise vertices, see convex_hull()
+        max_vertices (int)  : vertex budget
+
+    Returns:
+        numpy.ndarray
+    """
+
+    hull = np.array(hull, dtype=np.float64)
+    while len(hull) > max(max_vertices, 3):
+        a, b = np.roll(hull, 1, axis=0), hull
+        c, d = np.roll(hull, -1, axis=0), np.roll(hull, -2, axis=0)
+        u, v, w = b - a, c - d, c - b
+        denom = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (w[:, 0] * v[:, 1] - w[:, 1] * v[:, 0]) / denom
+            s = (w[:, 0] * u[:, 1] - w[:, 1] * u[:, 0]) / denom
+        q = b + t[:, None] * u
+        added = np.abs(w[:, 0] * (q[:, 1] - b[:, 1]) - w[:, 1] * (q[:, 0] - b[:, 0])) / 2
+        added[~((t >= 0) & (s >= 0) & np.isfinite(added))] = np.inf
+        n, wanted = len(hull), max((len(hull) - max(max_vertices, 3)) // 2, 1)
+        taken = np.zeros(n, dtype=bool)
+        edges = []
+        for i in np.argsort(added, kind='stable')[:wanted]:
+            if np.isinf(added[i]):
+                break
+            if not taken[i - 1] and not taken[(i + 1) % n]:
+                taken[i] = True
+                edges.append(i)
+        if not edges:
+            break
+        # q takes the place of b and c
+        edges = np.array(edges)
+        hull[edges] = q[edges]
+        hull = np.delete(hull, (edges + 1) % n, axis=0)
+    return hull
+
+def format_wkt(hull):
+    """
+    Render hull vertices (x = longitude, y = latitude) as WKT in the
+    latitude-longitude axis order of EPSG:4326.
+
+    Args:
+        hull (numpy.ndarray): vertices, see convex_hull()
+
+    Returns:
+        str
+    """
+
+    coords = ["{} {}".format(round(float(lat), 5), round(float(lon), 5)) for lon, lat in hull]
+    if len(coords) == 1:
+        return "POINT ({})".format(coords[0])
+    if len(coords) == 2:
+        return "LINESTRING ({})".format(", ".join(coords))
+    return "POLYGON (({}))".format(", ".join(coords + coords[:1]))
+
+def get_best_candidate(stats, possible_units, std_name, axis_name, short_name, min_score=1):
+    """
+    The best scoring variable for an extent, as compute_geo_extents() ranks
+    them; see score_candidates().
+
+    Returns:
+        str, or None if no variable matches
+    """
+
+    scores = score_candidates(stats, possible_units, std_name, axis_name, short_name, min_score)
+    if not scores:
+        return
+    return sorted(scores, key=lambda x: scores[x], reverse=True)[0]
+
+def compute_geospatial_bounds(nc, stats=None, max_vertices=BOUNDS_MAX_VERTICES):
+    """
+    Compute a geospatial_bounds footprint: the convex hull of the
+    latitude/longitude pairs of the best lat and lon variables, simplified
+    to `max_vertices` (see simplify_hull()).
+
+    Paired variables (trajectories, swaths, curvilinear grids) are read
+    block by block and each block's points are folded into the running
+    hull, itself simplified to BOUNDS_RUNNING_FACTOR times the budget, so
+    memory doesn't grow with the number of points. 1-D lat and lon
+    along different dimensions form a regular grid, whose footprint is the
+    rectangle of their extents and costs no further reads. Longitudes are
+    taken as given, so a footprint crossing the antimeridian spans the
+    globe instead.
+
+    Args:
+        nc (netCDF4.Dataset)    : open Dataset
+        stats (ExtentStatsTable): statistics shared with the extents; a new
+                                  table if None
+        max_vertices (int)      : vertex budget of the polygon
+
+    Returns:
+        str, WKT in EPSG:4326 axis order, or None if there's no footprint
+    """
+
+    if stats is None:
+        stats = ExtentStatsTable(nc)
+
+    lat_name = get_best_candidate(stats, **GEO_CFG["lat"])
+    lon_name = get_best_candidate(stats, **GEO_CFG["lon"])
+    if lat_name is None or lon_name is None:
+        return
+    lat, lon = nc.variables[lat_name], nc.variables[lon_name]
+
+    if lat.dimensions == lon.dimensions and lat.ndim:
+        if stats.header_only or stats.approx:
+            return
+        hull = np.empty((0, 2))
+        # two variables' blocks are held at once
+        for index in iter_blocks(lat, max(stats.max_elements // 2, 1)):
+            points = np.column_stack([
+                unpack_values(stats.read(lon, index), lon).ravel(),
+                unpack_values(stats.read(lat, index), lat).ravel()
+            ])
+            points = points[~np.isnan(points).any(axis=1)]
+            hull = convex_hull(drop_interior_points(np.concatenate([hull, points])))
+            hull = simplify_hull(hull, BOUNDS_RUNNING_FACTOR * max_vertices)
+    elif lat.ndim <= 1 and lon.ndim <= 1:
+        la, lo = stats[lat_name], stats[lon_name]
+        if la.all_nan or lo.all_nan:
+            return
+        hull = convex_hull(np.array([[lo.min, la.min], [lo.max, la.min], [lo.max, la.max], [lo.min, la.max]]))
+    else:
+        return
+
+    if len(hull) == 0:
+        return
+    return format_wkt(simplify_hull(hull, max_vertices))
+
+def print_geospatial_bounds(wkt):
+    """
+    Print the geospatial_bounds <attribute> tags.
+
+    Args:
+        wkt (str): footprint, see compute_geospatial_bounds()
+
+    Returns:
+        None
+    """
+
+    print('<attribute name="geospatial_bounds" value="{}" />'.format(wkt))
+    print('<attribute name="geospatial_bounds_crs" value="EPSG:4326" />')
+
+# layout of a compiled GCMD keyword index:
+#   header: magic, number of standard names, number of keywords
+#   names: (offset, length, first keyword, keyword count) per standard
+#          name, sorted by name
+#   keywords: (offset, length) per keyword
+#   followed by the UTF-8 strings the offsets point into
+GCMD_INDEX_MAGIC = b'GCMDIDX1'
+GCMD_INDEX_HEADER = struct.Struct('<8sII')
+GCMD_INDEX_NAME = struct.Struct('<IIII')
+GCMD_INDEX_KEYWORD = struct.Struct('<II')
+
+def read_gcmd_keywords(json_path):
+    """
+    Parse a standard name -> GCMD keywords JSON mapping, dropping empty
+    keywords.
+
+    Args:
+        json_path (str): path to the JSON mapping
+
+    Returns:
+        dict of str: list of str
+    """
+
+    with open(json_path) as fp:
+        gcmd_keywords = json.load(fp)
+    return {name: [kw for kw in kws if kw] for name, kws in gcmd_keywords.items()}
+
+def compile_gcmd_index(json_path, cache_dir=os.path.join(CACHE_DIR, 'gcmd')):
+    """
+    Compile a standard name -> GCMD keywords JSON mapping into an index
+    read by GcmdKeywordIndex. Empty keywords are dropped. The index is
+    keyed by the path, size and modification time of the JSON, so the JSON
+    is only parsed when it changes.
+
+    Args:
+        json_path (str): path to the JSON mapping
+        cache_dir (str): directory to keep compiled indexes in
+
+    Returns:
+        str, path to the compiled index
+    """
+
+    st = os.stat(json_path)
+    key = hashlib.sha1("{}:{}:{}".format(os.path.abspath(json_path), st.st_size, st.st_mtime_ns).encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, key + '.idx')
+    if os.path.exists(path):
+        return path
+
+    gcmd_keywords = read_gcmd_keywords(json_path)
+
+    blob = bytearray()
+    offsets = {}
+    def intern(text):
+        if text not in offsets:
+            data = text.encode('utf-8')
+            offsets[text] = (len(blob), len(data))
+            blob.extend(data)
+        return offsets[text]
+
+    names, keywords = [], []
+    for name in sorted(gcmd_keywords, key=lambda k: k.encode('utf-8')):
+        kws = gcmd_keywords[name]
+        names.append(intern(name) + (len(keywords), len(kws)))
+        keywords.extend(intern(kw) for kw in kws)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'wb') as fp:
+        fp.write(GCMD_INDEX_HEADER.pack(GCMD_INDEX_MAGIC, len(names), len(keywords)))
+        fp.writelines(GCMD_INDEX_NAME.pack(*n) for n in names)
+        fp.writelines(GCMD_INDEX_KEYWORD.pack(*kw) for kw in keywords)
+        fp.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+class GcmdKeywordIndex(object):
+    """
+    Read-only standard name -> GCMD keywords mapping over a compiled index
+    (see compile_gcmd_index()). The index is memory-mapped on the first
+    lookup and searched in place, so only the pages touched are read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = None
+
+    def _open(self):
+        with open(self.path, 'rb') as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._n_names, n_keywords = GCMD_INDEX_HEADER.unpack_from(self._mm, 0)
+        if magic != GCMD_INDEX_MAGIC:
+            raise ValueError("not a GCMD keyword index: {}".format(self.path))
+        self._names_at = GCMD_INDEX_HEADER.size
+        self._keywords_at = self._names_at + self._n_names * GCMD_INDEX_NAME.size
+        self._strings_at = self._keywords_at + n_keywords * GCMD_INDEX_KEYWORD.size
+
+    def _string(self, offset, length):
+        start = self._strings_at + offset
+        return self._mm[start:start + length]
+
+    def get(self, name, default=None):
+        """
+        Binary search for a standard name.
+
+        Args:
+            name (str)   : standard name
+            default (any): returned if the name isn't in the index
+
+        Returns:
+            list of str
+        """
+
+        if self._mm is None:
+            self._open()
+
+        key = name.encode('utf-8')
+        lo, hi = 0, self._n_names
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, first, count = GCMD_INDEX_NAME.unpack_from(self._mm, self._names_at + mid * GCMD_INDEX_NAME.size)
+            found = self._string(offset, length)
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return [
+                    self._string(*GCMD_INDEX_KEYWORD.unpack_from(self._mm, self._keywords_at + i * GCMD_INDEX_KEYWORD.size)).decode('utf-8')
+                    for i in range(first, first + count)
+                ]
+        return default
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name):
+        keywords = self.get(name)
+        if keywords is None:
+            raise KeyError(name)
+        return keywords
+
+@functools.lru_cache(maxsize=None)
+def load_gcmd_keywords():
+    """
+    Load the standard name -> GCMD keywords mapping, once per process,
+    from a compiled index of gcmd_contents.json. Where the index can't be
+    written, e.g. a read-only cache directory, the JSON is parsed into
+    memory instead.
 
     Returns:
-        None
+        GcmdKeywordIndex, or dict
     """
 
-    geo_extent_vars = {}
-    geo_extent_units = []
+    gcmd_keywords_path = os.path.join(os.path.dirname(__file__), 'gcmd_contents.json')
+    try:
+        return GcmdKeywordIndex(compile_gcmd_index(gcmd_keywords_path))
+    except OSError:
+        return read_gcmd_keywords(gcmd_keywords_path)
 
-    # variables must have units
-    for var in nc.get_variables_by_attributes(units=lambda x: x is not None):
-    
-        geo_extent_vars[var.name] = 0
-        # units in this set
-        if var.units in possible_units:
-            geo_extent_vars[var.name] += 1
-            geo_extent_units.append(var.units)
-    
+def find_standard_name_table_xml():
+    """
+    Locate the CF standard name table XML that
+    compliance_checker.cf.util.StandardNameTable() would parse, without
+    importing compliance_checker.
 
-        # standard name
-        if hasattr(var, 'standard_name') and var.standard_name == std_name:
-            geo_extent_vars[var.name] += 1
-            geo_extent_units.append(var.units)
-    
-        # axis of "X"
-        if hasattr(var, 'axis') and var.axis == axis_name:
-            geo_extent_vars[var.name] += 1
-            geo_extent_units.append(var.units)
-    
+    Returns:
+        str, or None if it can't be found
+    """
 
-        if var.name == std_name or var.name == short_name:
-            geo_extent_vars[var.name] += 1
-            geo_extent_units.append(var.units)
+    env_path = os.environ.get('CF_STANDARD_NAME_TABLE')
+    if env_path and os.path.exists(env_path):
+        return env_path
 
-    if len(geo_extent_vars) == 0:
+    spec = importlib.util.find_spec('compliance_checker')
+    if spec is None or not spec.submodule_search_locations:
         return
+    path = os.path.join(list(spec.submodule_search_locations)[0], 'data', 'cf-standard-name-table.xml')
+    return path if os.path.exists(path) else None
 
-    # filter out any zero scores
-    geo_extent_vars = dict(filter(lambda x: x[1]>0, geo_extent_vars.items()))
+def read_standard_names(xml_path):
+    """
+    Parse the standard names and aliases out of a CF standard name table.
 
-    # sort by criteria passed
-    final_geo_vars = sorted(geo_extent_vars, key=lambda x: geo_extent_vars[x], reverse=True)
+    Args:
+        xml_path (str): path to the standard name table XML
 
-    obs_mins = [np.nanmin(nc.variables[var]) for var in final_geo_vars if not np.isnan(nc.variables[var]).all()]
-    obs_maxs = [np.nanmax(nc.variables[var]) for var in final_geo_vars if not np.isnan(nc.variables[var]).all()]
+    Returns:
+        frozenset of str
+    """
 
-    # Let's just pick one
-    geo_vals = nc.variables[final_geo_vars[0][:]]
-    if geo_vals.size == 1:
-        obs_res = [0.0]
-    else:
-        obs_res = [np.nanmean(np.diff(nc.variables[var])) for var in final_geo_vars if not np.isnan(nc.variables[var]).all()]
+    import xml.etree.ElementTree as ET
 
-    geo_min = round(float(min(obs_mins)), 5)
-    geo_max = round(float(max(obs_maxs)), 5)
-    geo_extent_units = [nc.variables[k].units for k, v in geo_extent_vars.items()][0]
-    geo_res = "{} {}".format(round(float(abs(np.mean(obs_res))), 5), geo_extent_units)
+    # same names as StandardNameTable.__contains__ looks in
+    names = set()
+    for event, node in ET.iterparse(xml_path):
+        if node.tag in ('entry', 'alias'):
+            names.add(node.get('id'))
+            node.clear()
+    return frozenset(filter(None, names))
 
-    print('<attribute name="geospatial_{}_min" value="{}" />'.format(short_name, geo_min))
-    print('<attribute name="geospatial_{}_max" value="{}" />'.format(short_name, geo_max))
-    print('<attribute name="geospatial_{}_resolution" value="{}" />'.format(short_name, geo_res))
-    print('<attribute name="geospatial_{}_units" value="{}" />'.format(short_name, geo_extent_units))
+def compile_standard_name_table(xml_path, cache_dir=os.path.join(CACHE_DIR, 'standard_names')):
+    """
+    Compile the standard names and aliases of a CF standard name table into
+    a newline-separated text file, once per table version.
+
+    The artifact is keyed by the table's version_number and the size and
+    modification time of the XML, so the XML is only parsed when it changes.
+
+    Args:
+        xml_path (str) : path to the standard name table XML
+        cache_dir (str): directory to keep compiled tables in
 
-def main(fpath, kwds=True):
+    Returns:
+        str, path to the compiled table
     """
-    Main function to get geospatial extent metadata.
+
+    with open(xml_path, 'rb') as fp:
+        match = re.search(rb'<version_number>\s*([^<\s]+)\s*</version_number>', fp.read(4096))
+    version = match.group(1).decode('utf-8') if match else 'unknown'
+
+    st = os.stat(xml_path)
+    key = hashlib.sha1("{}:{}:{}".format(os.path.abspath(xml_path), st.st_size, st.st_mtime_ns).encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, "v{}-{}.txt".format(version, key[:12]))
+    if os.path.exists(path):
+        return path
+
+    names = read_standard_names(xml_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'w', encoding='utf-8') as fp:
+        fp.write("\n".join(sorted(names)))
+    os.replace(tmp_path, path)
+    return path
+
+@functools.lru_cache(maxsize=None)
+def load_standard_name_table():
+    """
+    Load the CF standard name table, once per process.
+
+    The names come from a compiled copy of the table, see
+    compile_standard_name_table(), and support the same `in` test as
+    compliance_checker.cf.util.StandardNameTable, which is only built if
+    the table's XML can't be found. Where the compiled copy can't be
+    written, e.g. a read-only cache directory, the XML is parsed into
+    memory instead.
+
+    Returns:
+        frozenset, or compliance_checker.cf.util.StandardNameTable
+    """
+
+    xml_path = find_standard_name_table_xml()
+    if xml_path is None:
+        from compliance_checker.cf import util
+        return util.StandardNameTable()
+
+    try:
+        compiled_path = compile_standard_name_table(xml_path)
+    except OSError:
+        return read_standard_names(xml_path)
+    with open(compiled_path, encoding='utf-8') as fp:
+        return frozenset(fp.read().split("\n"))
+
+def get_suggested_keywords(nc):
+    """
+    Suggest keywords for a dataset: GCMD keywords mapped from its variables'
+    standard names, followed by the standard names themselves, without
+    duplicates. Both come from one pass over the variables.
 
     Args:
-        fpath (str): path to NetCDF dataset (can be OPeNDAP)
-        kwds (bool): print out suggested keywords; default True
+        nc (netCDF4.Dataset): open Dataset
 
     Returns:
-        None
+        list of str
     """
 
-    gcmd_keywords_path = os.path.join(os.path.dirname(__file__), 'gcmd_contents.json')
-    suggested_keywords = {'suggested_keywords': []}
+    gcmd_suggestions = []
+    standard_name_suggestions = []
 
-    with open(gcmd_keywords_path) as fp:
-        gcmd_keywords = json.load(fp)
-        fp.close()
+    for cf_var in nc.variables.values():
+        standard_name = getattr(cf_var, 'standard_name', None)
+        if standard_name is None:
+            continue
 
-    with netCDF4.Dataset(fpath) as nc:
         # Add GCMD keywords
-        for cf_var in nc.variables:
-            cf_var = nc.variables[cf_var]
-            standard_name = getattr(cf_var, 'standard_name', None)
-            if standard_name is None:
-                continue
-            if standard_name in gcmd_keywords:
-                for keyword in gcmd_keywords[standard_name]:
-                    if keyword:
-                        suggested_keywords['suggested_keywords'].append(keyword)
+        gcmd_suggestions.extend(load_gcmd_keywords().get(standard_name, ()))
 
         # Add cf standard names
-        standard_name_table = util.StandardNameTable()
-        for cf_var in nc.variables:
-            cf_var = nc.variables[cf_var]
-            standard_name = getattr(cf_var, 'standard_name', None)
-            if standard_name is None:
+        if standard_name in ['time', 'latitude', 'longitude']:
+            continue
+        if standard_name in load_standard_name_table():
+            standard_name_suggestions.append(standard_name)
+
+    return list(dict.fromkeys(gcmd_suggestions + standard_name_suggestions))
+
+def get_stats_table(nc, fpath, header_only=False, dap_cache=None, increments=None, scanner=None, max_memory=None, approx=False, profiler=None):
+    """
+    Build the statistics table shared by the axis passes over a dataset.
+
+    Remote (OPeNDAP) variables are fetched one block per request, with no
+    chunk cache to share the cap with, and the responses are kept under
+    `dap_cache` if given.
+
+    Args:
+        nc (netCDF4.Dataset): open Dataset
+        fpath (str)         : path or URL `nc` was opened from
+        header_only (bool)  : see ExtentStatsTable
+        dap_cache (str)     : directory caching OPeNDAP responses
+        increments (IncrementalState): see ExtentStatsTable; ignored for
+                                       OPeNDAP
+        scanner (ParallelScanner): see ExtentStatsTable; ignored for
+                                   OPeNDAP
+        max_memory (int)    : bytes a variable's scan may hold at once;
+                              default None, blocks of MAX_BLOCK_ELEMENTS
+        approx (bool)       : see ExtentStatsTable
+        profiler (Profiler) : see ExtentStatsTable
+
+    Returns:
+        ExtentStatsTable
+    """
+
+    if is_remote(fpath):
+        read = DapResponseCache(fpath, dap_cache).read if dap_cache else read_raw_block
+        max_elements = get_max_elements(max_memory, chunk_cache=False) or MAX_BLOCK_ELEMENTS
+        return ExtentStatsTable(nc, max_elements, header_only, read, approx=approx, profiler=profiler)
+
+    chunk_cache = int(max_memory * CHUNK_CACHE_SHARE) if max_memory is not None else None
+    return ExtentStatsTable(nc, get_max_elements(max_memory) or MAX_BLOCK_ELEMENTS, header_only,
+                            increments=increments, scanner=scanner, chunk_cache=chunk_cache, approx=approx, profiler=profiler)
+
+def get_max_elements(max_memory, chunk_cache=True):
+    """
+    Number of elements to read per block to keep a scan within a memory cap.
+
+    Args:
+        max_memory (int)  : bytes, or None
+        chunk_cache (bool): part of the cap goes to the HDF5 chunk cache, see
+                            CHUNK_CACHE_SHARE; default True
+
+    Returns:
+        int, or None if `max_memory` is None
+    """
+
+    if max_memory is None:
+        return
+    if chunk_cache:
+        max_memory -= int(max_memory * CHUNK_CACHE_SHARE)
+    return max(max_memory // SCAN_BYTES_PER_ELEMENT, 1)
+
+def parse_size(size):
+    """
+    Parse a size such as "256M" or "2G" into bytes.
+
+    Args:
+        size (str): number, optionally followed by K, M, G or T
+
+    Returns:
+        int
+    """
+
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', str(size), re.IGNORECASE)
+    if match is None:
+        raise ValueError("invalid size: {}".format(size))
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+class ExtentCache(object):
+    """
+    SQLite cache of dataset records (see describe_dataset()).
+
+    An entry is valid while the file keeps the same size, modification
+    time and inode, and, with `use_hash`, the same SHA-1 of its contents.
+    Entries are also keyed by the options which change a record, e.g.
+    whether keywords were collected. OPeNDAP URLs have no identity to check
+    and are never cached.
+
+    The same database keeps the per-variable reductions used to extend the
+    extents of growing files, see scan_incremental(). When the stored
+    records and reductions together grow past `max_size` bytes the least
+    recently used of either are evicted.
+    """
+
+    def __init__(self, db_path=os.path.join(CACHE_DIR, 'extents.sqlite'), max_size=None, use_hash=False):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        # batch workers share the database for incremental state
+        self.db = sqlite3.connect(db_path, timeout=60)
+        self.max_size = max_size
+        self.use_hash = use_hash
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS extents (
+                path TEXT,
+                options TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                hash TEXT,
+                record TEXT,
+                nbytes INTEGER,
+                accessed REAL,
+                PRIMARY KEY (path, options)
+            )
+        """)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(increments)")]
+        if columns and "nbytes" not in columns:
+            # reductions stored before they were evicted; they're only a cache
+            self.db.execute("DROP TABLE increments")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS increments (
+                path TEXT,
+                variable TEXT,
+                state TEXT,
+                nbytes INTEGER,
+                accessed REAL,
+                PRIMARY KEY (path, variable)
+            )
+        """)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def identity(self, fpath):
+        """
+        Identify the current state of a file.
+
+        Args:
+            fpath (str): path to a local file
+
+        Returns:
+            tuple of (size, mtime_ns, inode, hash or None), or None for URLs
+            and missing files
+        """
+
+        if is_remote(fpath):
+            return
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            return
+
+        digest = None
+        if self.use_hash:
+            sha1 = hashlib.sha1()
+            with open(fpath, 'rb') as fp:
+                for data in iter(lambda: fp.read(2 ** 20), b''):
+                    sha1.update(data)
+            digest = sha1.hexdigest()
+        return (st.st_size, st.st_mtime_ns, st.st_ino, digest)
+
+    def get(self, fpath, options, identity=None):
+        """
+        Look up the record of an unchanged file.
+
+        Args:
+            fpath (str)     : dataset path
+            options (dict)  : options the record was computed with
+            identity (tuple): as from identity(); looked up if None
+
+        Returns:
+            dict or None
+        """
+
+        identity = identity or self.identity(fpath)
+        if identity is None:
+            return
+
+        key = (os.path.abspath(fpath), json.dumps(options, sort_keys=True))
+        row = self.db.execute(
+            "SELECT size, mtime_ns, inode, hash, record FROM extents WHERE path = ? AND options = ?", key
+        ).fetchone()
+        if row is None or tuple(row[:4]) != identity:
+            return
+
+        self.db.execute("UPDATE extents SET accessed = ? WHERE path = ? AND options = ?", (time.time(),) + key)
+        self.db.commit()
+        return json.loads(row[4])
+
+    def put(self, fpath, options, record, identity=None):
+        """
+        Store the record of a file, then evict entries over `max_size`.
+
+        Args:
+            fpath (str)     : dataset path
+            options (dict)  : options the record was computed with
+            record (dict)   : record to store; records with errors are not
+            identity (tuple): identity of the file *before* the record was
+                              computed; looked up if None
+
+        Returns:
+            None
+        """
+
+        identity = identity or self.identity(fpath)
+        if identity is None or record.get("error"):
+            return
+
+        data = json.dumps(record)
+        self.db.execute(
+            "INSERT OR REPLACE INTO extents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(fpath), json.dumps(options, sort_keys=True)) + tuple(identity) + (data, len(data), time.time())
+        )
+        self.evict()
+        self.db.commit()
+
+    def get_increment(self, fpath, variable):
+        row = self.db.execute(
+            "SELECT state FROM increments WHERE path = ? AND variable = ?", (os.path.abspath(fpath), variable)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_increment(self, fpath, variable, state):
+        data = json.dumps(state)
+        self.db.execute(
+            "INSERT OR REPLACE INTO increments VALUES (?, ?, ?, ?, ?)",
+            (os.path.abspath(fpath), variable, data, len(data), time.time())
+        )
+        self.db.commit()
+
+    def drop_increments(self, fpath):
+        """
+        Forget the reductions of a file, so its growing variables are
+        rescanned in full.
+        """
+
+        self.db.execute("DELETE FROM increments WHERE path = ?", (os.path.abspath(fpath),))
+        self.db.commit()
+
+    def evict(self):
+        if self.max_size is None:
+            return
+
+        total = self.db.execute("""
+            SELECT (SELECT COALESCE(SUM(nbytes), 0) FROM extents) + (SELECT COALESCE(SUM(nbytes), 0) FROM increments)
+        """).fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        rows = self.db.execute("""
+            SELECT 'extents', rowid, nbytes, accessed FROM extents
+            UNION ALL
+            SELECT 'increments', rowid, nbytes, accessed FROM increments
+            ORDER BY accessed
+        """).fetchall()
+        stale = {"extents": [], "increments": []}
+        for table, rowid, nbytes, _ in rows:
+            if total <= self.max_size:
+                break
+            stale[table].append((rowid,))
+            total -= nbytes
+        for table, rowids in stale.items():
+            self.db.executemany("DELETE FROM {} WHERE rowid = ?".format(table), rowids)
+
+def describe_dataset(fpath, kwds=True, header_only=False, dap_cache=None, catch_errors=True, incremental_db=None, read_workers=None, max_memory=None, approx=False, bounds=None, profile=False):
+    """
+    Collect the extents and suggested keywords of one dataset as a record.
+
+    By default any error is caught and reported in the record, so one bad
+    file doesn't stop a batch.
+
+    Args:
+        fpath (str)        : path to NetCDF dataset (can be OPeNDAP)
+        kwds (bool)        : include suggested keywords; default True
+        header_only (bool) : see ExtentStatsTable; default False
+        dap_cache (str)    : directory caching OPeNDAP responses; default None
+        catch_errors (bool): report errors in the record instead of raising;
+                             default True
+        incremental_db (str): ExtentCache database keeping reductions of
+                              growing variables, see scan_incremental();
+                              default None
+        read_workers (int) : processes reading each large variable of a
+                             local file in parallel, see ParallelScanner;
+                             default None, read in this process
+        max_memory (int)   : bytes each process may hold to scan a
+                             variable; default None, see get_stats_table()
+        approx (bool)      : estimate extents from samples, see
+                             scan_sampled(); default False
+        bounds (int)       : vertex budget of a geospatial_bounds footprint,
+                             see compute_geospatial_bounds(); default None,
+                             no footprint
+        profile (bool)     : time each phase and variable, see Profiler;
+                             default False
+
+    Returns:
+        dict of path, extents ({short name: extent}, see
+        compute_geo_extents()), time_coverage (see compute_time_coverage()),
+        bounds (see compute_geospatial_bounds()), keywords, error and
+        elapsed seconds, plus profile (see Profiler.report()) if `profile`
+    """
+
+    start = time.perf_counter()
+    record = {"path": fpath, "extents": {}, "time_coverage": None, "bounds": None, "keywords": None, "error": None}
+    cache = increments = scanner = None
+    profiler = Profiler() if profile else None
+
+    def phase(name):
+        return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+    try:
+        # netCDF4 and numpy are imported lazily, on first use; touched here
+        # so a profile doesn't count their import as opening the file
+        with phase("import"):
+            netCDF4.Dataset, np.ndarray
+        if incremental_db is not None and not is_remote(fpath):
+            cache = ExtentCache(incremental_db)
+            increments = IncrementalState(cache, fpath)
+        if read_workers and not is_remote(fpath):
+            scanner = ParallelScanner(
+                fpath,
+                read_workers,
+                get_max_elements(max_memory) or MAX_BLOCK_ELEMENTS,
+                int(max_memory * CHUNK_CACHE_SHARE) if max_memory is not None else None
+            )
+        with phase("open"):
+            nc = netCDF4.Dataset(fpath)
+        with nc:
+            stats = get_stats_table(nc, fpath, header_only, dap_cache, increments, scanner, max_memory, approx, profiler)
+            for short_name, g in GEO_CFG.items():
+                with phase("extent " + short_name):
+                    extent = compute_geo_extents(nc, stats=stats, **g)
+                if extent is not None:
+                    record["extents"][short_name] = extent
+            with phase("time_coverage"):
+                record["time_coverage"] = compute_time_coverage(nc, stats=stats, **TIME_CFG)
+            if bounds:
+                with phase("bounds"):
+                    record["bounds"] = compute_geospatial_bounds(nc, stats, bounds)
+            if kwds:
+                # both are loaded once per process; split out here so a
+                # profile tells their cost from the scan
+                with phase("gcmd_index"):
+                    load_gcmd_keywords()
+                with phase("standard_name_table"):
+                    load_standard_name_table()
+                with phase("keywords"):
+                    record["keywords"] = get_suggested_keywords(nc)
+    except Exception as e:
+        if not catch_errors:
+            raise
+        record["error"] = "{}: {}".format(type(e).__name__, e)
+    finally:
+        if cache is not None:
+            cache.close()
+        if scanner is not None:
+            scanner.close()
+
+    record["elapsed"] = round(time.perf_counter() - start, 6)
+    if profiler is not None:
+        record["profile"] = profiler.report()
+    return record
+
+def print_record(record, kwds=True):
+    """
+    Print a record (see describe_dataset()) as <attribute> tags, followed
+    by the suggested keywords.
+
+    Args:
+        record (dict): dataset record
+        kwds (bool)  : print out suggested keywords; default True
+
+    Returns:
+        None
+    """
+
+    for short_name, extent in record["extents"].items():
+        print_geo_attributes(
+            short_name,
+            extent["min"],
+            extent["max"],
+            extent["resolution"],
+            extent["units"],
+            extent["sources"],
+            extent.get("positive"),
+            extent.get("axis_spacing"),
+            extent.get("error", 0.0)
+        )
+
+    if record.get("bounds") is not None:
+        print_geospatial_bounds(record["bounds"])
+
+    if record["time_coverage"] is not None:
+        print_time_coverage(record["time_coverage"])
+
+    if kwds:
+        print(','.join(record["keywords"]))
+
+def expand_datasets(patterns):
+    """
+    Expand paths, globs and directories (searched recursively for .nc files)
+    into dataset paths. URLs are passed through, as are patterns matching
+    nothing, so they're reported as errors rather than silently dropped.
+
+    Args:
+        patterns (list of str): paths, glob patterns, directories or URLs
+
+    Returns:
+        generator of str
+    """
+
+    for pattern in patterns:
+        if is_remote(pattern):
+            yield pattern
+        elif os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for f in sorted(files):
+                    if f.endswith('.nc'):
+                        yield os.path.join(root, f)
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                yield pattern
+            for match in matches:
+                if os.path.isfile(match):
+                    yield match
+
+def iter_records(patterns, workers=None, kwds=True, header_only=False, dap_cache=None, cache=None, refresh=False, incremental=False, max_memory=None, approx=False, bounds=None, profile=False):
+    """
+    Describe many datasets over a process pool, yielding their records (see
+    describe_dataset()) in completion order. Records served from `cache`
+    come first, with "cached" set.
+
+    Args:
+        patterns (list of str): paths, glob patterns, directories or URLs
+        workers (int)         : number of processes; default os.cpu_count()
+        kwds (bool)           : include suggested keywords; default True
+        header_only (bool)    : see ExtentStatsTable; default False
+        dap_cache (str)       : directory caching OPeNDAP responses; default None
+        cache (ExtentCache)   : cache of records; default None
+        refresh (bool)        : recompute and re-store cached records, and
+                                rescan growing files in full; default False
+        incremental (bool)    : only read records appended to growing files
+                                since their last run, tracked in `cache`;
+                                default False
+        max_memory (int)      : bytes each worker may hold to scan a
+                                variable; default None
+        approx (bool)         : estimate extents from samples; default False
+        bounds (int)          : vertex budget of geospatial_bounds; default
+                                None, no footprint
+        profile (bool)        : add a profile to records not served from
+                                `cache`, see Profiler; default False
+
+    Returns:
+        generator of dict
+    """
+
+    import concurrent.futures
+
+    options = {"kwds": kwds, "header_only": header_only, "max_memory": max_memory, "approx": approx, "bounds": bounds, "version": RECORD_VERSION}
+    incremental_db = cache.db_path if cache is not None and incremental else None
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for fpath in expand_datasets(patterns):
+            identity = cache.identity(fpath) if cache is not None else None
+            record = cache.get(fpath, options, identity) if identity and not refresh else None
+            if incremental_db and refresh:
+                cache.drop_increments(fpath)
+            if record is not None:
+                record["cached"] = True
+                yield record
                 continue
-            if standard_name in ['time', 'latitude', 'longitude']:
+            future = pool.submit(describe_dataset, fpath, kwds, header_only, dap_cache, True, incremental_db, None, max_memory, approx, bounds, profile)
+            futures[future] = (fpath, identity)
+
+        for future in concurrent.futures.as_completed(futures):
+            fpath, identity = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # the worker itself died
+                record = {
+                    "path": fpath,
+                    "extents": {},
+                    "time_coverage": None,
+                    "bounds": None,
+                    "keywords": None,
+                    "error": "{}: {}".format(type(e).__name__, e),
+                    "elapsed": None
+                }
+            if identity is not None:
+                cache.put(fpath, options, dict((k, v) for k, v in record.items() if k != "profile"), identity)
+            record["cached"] = False
+            yield record
+
+def batch_main(patterns, workers=None, kwds=True, header_only=False, dap_cache=None, cache=None, refresh=False, incremental=False, max_memory=None, approx=False, bounds=None, profile=False):
+    """
+    Print the records of many datasets as JSON lines, see iter_records().
+
+    Returns:
+        None
+    """
+
+    for record in iter_records(patterns, workers, kwds, header_only, dap_cache, cache, refresh, incremental, max_memory, approx, bounds, profile):
+        print(json.dumps(record), flush=True)
+
+def merge_partials(a, b):
+    """
+    Merge the partial reductions of two extents; associative and
+    commutative, so a collection can be reduced in any order.
+
+    Args:
+        a (dict): min, max, count, diff_sum and diff_count, or None
+        b (dict): same
+
+    Returns:
+        dict
+    """
+
+    if a is None:
+        return dict(b)
+    return {
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+        "count": a["count"] + b["count"],
+        "diff_sum": a["diff_sum"] + b["diff_sum"],
+        "diff_count": a["diff_count"] + b["diff_count"]
+    }
+
+def summarize_record(record):
+    """
+    Reduce a record to what a collection aggregate needs.
+
+    Time spacing is converted to seconds, so files with different time
+    units can be merged.
+
+    Args:
+        record (dict): see describe_dataset()
+
+    Returns:
+        dict of extents ({short name: partial, units and positive}),
+        time (partial with start and end in place of min and max) and
+        keywords
+    """
+
+    summary = {"extents": {}, "time": None, "keywords": record["keywords"] or []}
+    for short_name, extent in record["extents"].items():
+        summary["extents"][short_name] = dict(extent["partial"], units=extent["units"], positive=extent.get("positive"))
+
+    coverage = record["time_coverage"]
+    if coverage is not None:
+        summary["time"] = {
+            "start": coverage["start"],
+            "end": coverage["end"],
+            "diff_sum": coverage["partial"]["diff_sum"] * coverage["seconds_per_unit"],
+            "diff_count": coverage["partial"]["diff_count"]
+        }
+    return summary
+
+def convert_partial(extent, units):
+    """
+    Convert an extent of a summary (see summarize_record()) to other units.
+
+    Args:
+        extent (dict): partial with units and positive
+        units (str)  : units to convert to
+
+    Returns:
+        dict
+
+    Raises:
+        ValueError if the units can't be converted
+    """
+
+    conversion = convert_units(extent["units"], units)
+    if conversion is None or conversion[0] <= 0:
+        raise ValueError("can't convert {} to {}".format(extent["units"], units))
+    scale, offset = conversion
+    if (scale, offset) == (1.0, 0.0):
+        return extent
+    return dict(
+        extent,
+        min=extent["min"] * scale + offset,
+        max=extent["max"] * scale + offset,
+        diff_sum=extent["diff_sum"] * scale,
+        units=units
+    )
+
+def merge_summaries(a, b):
+    """
+    Merge two summaries (see summarize_record()); associative, so a
+    collection's summary can be updated one file at a time. Extents are
+    converted to the units of the first file having them.
+
+    Args:
+        a (dict): summary
+        b (dict): summary
+
+    Returns:
+        dict
+
+    Raises:
+        ValueError if an extent's units can't be converted, or its
+        vertical directions differ
+    """
+
+    extents = dict(a["extents"])
+    for short_name, extent in b["extents"].items():
+        if short_name in extents:
+            merged = extents[short_name]
+            if None not in (merged["positive"], extent["positive"]) and merged["positive"] != extent["positive"]:
+                raise ValueError("can't merge {} positive {} with positive {}".format(short_name, extent["positive"], merged["positive"]))
+            try:
+                extent = convert_partial(extent, merged["units"])
+            except ValueError as e:
+                raise ValueError("can't merge {}: {}".format(short_name, e)) from None
+            extents[short_name] = dict(merged, **merge_partials(merged, extent))
+        else:
+            extents[short_name] = dict(extent)
+
+    time = a["time"] or b["time"]
+    if a["time"] is not None and b["time"] is not None:
+        # ISO 8601 times in one format sort as strings
+        time = {
+            "start": min(a["time"]["start"], b["time"]["start"]),
+            "end": max(a["time"]["end"], b["time"]["end"]),
+            "diff_sum": a["time"]["diff_sum"] + b["time"]["diff_sum"],
+            "diff_count": a["time"]["diff_count"] + b["time"]["diff_count"]
+        }
+
+    return {
+        "extents": extents,
+        "time": time,
+        "keywords": list(dict.fromkeys(a["keywords"] + b["keywords"]))
+    }
+
+EMPTY_SUMMARY = {"extents": {}, "time": None, "keywords": []}
+
+class CollectionAggregate(object):
+    """
+    Extents of a collection of files, kept in a JSON state file.
+
+    The state holds each file's summary (see summarize_record()) and their
+    merge. Adding a file merges its summary into the total; replacing or
+    removing one re-merges the stored summaries, since a min or max can't
+    be taken back out. Neither reads any file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.total = EMPTY_SUMMARY
+        if os.path.exists(path):
+            with open(path) as fp:
+                state = json.load(fp)
+            self.files = state["files"]
+            self.total = state["total"]
+
+    @staticmethod
+    def get_key(fpath):
+        """
+        Key a file by its absolute path, so it's the same file however it
+        was given; URLs are kept as they are.
+        """
+
+        return fpath if is_remote(fpath) else os.path.abspath(fpath)
+
+    def add(self, record):
+        """
+        Add or replace a file, from its record. The aggregate is left as
+        it was if the file can't be merged.
+
+        Args:
+            record (dict): see describe_dataset()
+
+        Returns:
+            None
+
+        Raises:
+            ValueError if the file's extents can't be merged with the
+            collection's, e.g. units which can't be converted
+        """
+
+        key = self.get_key(record["path"])
+        summary = summarize_record(record)
+        if key in self.files:
+            files = dict(self.files, **{key: summary})
+            self.total = self.merge(files.values())
+            self.files = files
+        else:
+            self.total = merge_summaries(self.total, summary)
+            self.files[key] = summary
+
+    def remove(self, fpath):
+        """
+        Remove a file, if present.
+
+        Args:
+            fpath (str): path or URL of the file
+
+        Returns:
+            bool, whether it was present
+        """
+
+        key = self.get_key(fpath)
+        if key not in self.files:
+            return False
+        files = dict(self.files)
+        del files[key]
+        self.total = self.merge(files.values())
+        self.files = files
+        return True
+
+    @staticmethod
+    def merge(summaries):
+        return functools.reduce(merge_summaries, summaries, EMPTY_SUMMARY)
+
+    def save(self):
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp_path, 'w') as fp:
+            json.dump({"files": self.files, "total": self.total}, fp)
+        os.replace(tmp_path, self.path)
+
+    def record(self):
+        """
+        The collection's extents, shaped like a dataset record (see
+        describe_dataset()) so they can be printed with print_record().
+
+        Returns:
+            dict
+        """
+
+        record = {"path": self.path, "extents": {}, "time_coverage": None, "keywords": self.total["keywords"], "error": None}
+        for short_name in GEO_CFG:
+            extent = self.total["extents"].get(short_name)
+            if extent is None:
                 continue
-            if standard_name in standard_name_table:
-                suggested_keywords['suggested_keywords'].append(standard_name)
-
-        # make dict to unpack in the get_geo_extents() function
-        geo_cfg = {
-            "lat": {
-                "possible_units": (
-                    'degrees_east',
-                    'degree_east',
-                    'degrees_E',
-                    'degree_E',
-                    'degreesE',
-                    'degreeE'
-                ),
-                "std_name": "latitude",
-                "axis_name": "X",
-                "short_name": "lat"
-            },
-
-            "lon": {
-                "possible_units": (
-                    'degrees_north',
-                    'degree_north',
-                    'degrees_N',
-                    'degree_N',
-                    'degreesN',
-                    'degreeN'
-                ),
-                "std_name": "longitude",
-                "axis_name": "Y",
-                "short_name": "lon"
+            geo_res = None
+            if extent["diff_count"]:
+                geo_res = "{} {}".format(round(extent["diff_sum"] / extent["diff_count"], 5), extent["units"])
+            record["extents"][short_name] = {
+                "min": round(extent["min"], 5),
+                "max": round(extent["max"], 5),
+                "resolution": geo_res,
+                "units": extent["units"],
+                "sources": None,
+                "positive": extent["positive"]
+            }
 
+        time = self.total["time"]
+        if time is not None:
+            parse = lambda t: datetime.datetime.strptime(t, "%Y-%m-%dT%H:%M:%SZ")
+            record["time_coverage"] = {
+                "start": time["start"],
+                "end": time["end"],
+                "duration": format_iso_duration((parse(time["end"]) - parse(time["start"])).total_seconds()),
+                "resolution": format_iso_duration(time["diff_sum"] / time["diff_count"]) if time["diff_count"] else None,
+                "sources": None
             }
-        }
+        return record
+
+def aggregate_main(state_path, patterns, workers=None, kwds=True, header_only=False, dap_cache=None, cache=None, refresh=False, incremental=False, max_memory=None, approx=False):
+    """
+    Describe datasets in parallel, merge them into a collection aggregate
+    (see CollectionAggregate) and print the collection's extents as
+    <attribute> tags. Files already in the aggregate are only read if
+    given again.
+
+    Args:
+        state_path (str): JSON file keeping the aggregate between runs
+        see iter_records() for the others
+
+    Returns:
+        None
+    """
 
-        # print
-        for g in geo_cfg.values():
-            get_geo_extents(nc, **g)
+    aggregate = CollectionAggregate(state_path)
+    for record in iter_records(patterns, workers, kwds, header_only, dap_cache, cache, refresh, incremental, max_memory, approx):
+        if record["error"] is not None:
+            print("skipping {}: {}".format(record["path"], record["error"]), file=sys.stderr)
+            continue
+        try:
+            aggregate.add(record)
+        except ValueError as e:
+            print("skipping {}: {}".format(record["path"], e), file=sys.stderr)
+    aggregate.save()
 
-        if kwds:
-            print(','.join(suggested_keywords['suggested_keywords']))
+    print_record(aggregate.record(), kwds)
+
+def main(fpath, kwds=True, header_only=False, dap_cache=None, cache=None, refresh=False, incremental=False, read_workers=None, max_memory=None, approx=False, bounds=None, profile=False):
+    """
+    Main function to get geospatial extent metadata.
+
+    Args:
+        fpath (str)        : path to NetCDF dataset (can be OPeNDAP)
+        kwds (bool)        : print out suggested keywords; default True
+        header_only (bool) : prefer extents given by attributes over reading
+                             data; default False
+        dap_cache (str)    : directory caching OPeNDAP responses; default None
+        cache (ExtentCache): cache of records; default None
+        refresh (bool)     : ignore, then replace, any cached record, and
+                             rescan growing variables in full; default False
+        incremental (bool) : only read records appended to a growing file
+                             since its last run, tracked in `cache`; default False
+        read_workers (int) : processes reading large variables in parallel;
+                             default None
+        max_memory (int)   : bytes each process may hold to scan a variable;
+                             default None
+        approx (bool)      : estimate extents from samples; default False
+        bounds (int)       : vertex budget of geospatial_bounds; default
+                             None, no footprint
+        profile (bool)     : print a JSON profile of the run to stderr, see
+                             Profiler; default False
+
+    Returns:
+        None
+    """
+
+    options = {"kwds": kwds, "header_only": header_only, "max_memory": max_memory, "approx": approx, "bounds": bounds, "version": RECORD_VERSION}
+    identity = cache.identity(fpath) if cache is not None else None
+    record = cache.get(fpath, options, identity) if identity and not refresh else None
+    report = {"path": fpath, "cached": record is not None}
+    if record is None:
+        incremental_db = cache.db_path if cache is not None and incremental else None
+        if incremental_db and refresh:
+            cache.drop_increments(fpath)
+        record = describe_dataset(fpath, kwds, header_only, dap_cache, False, incremental_db, read_workers, max_memory, approx, bounds, profile)
+        report["elapsed"] = record["elapsed"]
+        report.update(record.pop("profile", {}))
+        if identity is not None:
+            cache.put(fpath, options, record, identity)
+
+    print_record(record, kwds)
+    if profile:
+        print(json.dumps(report, indent=2), file=sys.stderr)
 
     return
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("dataset", help="dataset to get extents for; must be .nc or OPeNDAP")
+    parser.add_argument("dataset", help="dataset to get extents for; must be .nc or OPeNDAP", nargs="+")
     parser.add_argument("--k", help="don't print auto-generated keywords", action="store_false")
+    parser.add_argument("--header-only", help="take extents from attributes where possible and report where each value came from", action="store_true")
+    parser.add_argument("--dap-cache", help="cache OPeNDAP responses, by default in ~/.cache/get_geo_attrs/dap", action="store_true")
+    parser.add_argument("--dap-cache-dir", help="directory for --dap-cache, which it implies", default=None)
+    parser.add_argument("--batch", help="describe every dataset, glob or directory given as one JSON line each", action="store_true")
+    parser.add_argument("--workers", help="number of processes for --batch; default is the CPU count", type=int, default=None)
+    parser.add_argument("--cache", help="cache results for unchanged files in a SQLite file, by default ~/.cache/get_geo_attrs/extents.sqlite", action="store_true")
+    parser.add_argument("--cache-file", help="SQLite file for --cache, which it implies", default=None)
+    parser.add_argument("--cache-max-size", help="evict least recently used cache entries, including --incremental state, beyond this size, e.g. 64M", type=parse_size, default=None)
+    parser.add_argument("--cache-hash", help="also require an unchanged SHA-1 of the file contents for a cache hit", action="store_true")
+    parser.add_argument("--refresh", help="recompute results even if cached, rescanning growing variables in full", action="store_true")
+    parser.add_argument("--incremental", help="with --cache, only read records appended along an unlimited dimension since the last run; earlier records are checked for rewrites by hashing a sample of {} of them, so use --refresh after rewriting others".format(FINGERPRINT_RECORDS), action="store_true")
+    parser.add_argument("--read-workers", help="number of processes decompressing and reducing large variables of a local file in parallel", type=int, default=None)
+    parser.add_argument("--max-memory", help="bytes each process may hold to scan a variable, e.g. 256M", type=parse_size, default=None)
+    parser.add_argument("--approx", help="estimate extents from a sample of each variable and report error bounds", action="store_true")
+    parser.add_argument("--bounds", help="also print a geospatial_bounds footprint", action="store_true")
+    parser.add_argument("--bounds-vertices", help="most vertices in the --bounds footprint, which it implies; default {}".format(BOUNDS_MAX_VERTICES), type=int, default=None)
+    parser.add_argument("--aggregate", help="JSON file of a collection's extents; merge the datasets into it and print the collection's attributes", default=None)
+    parser.add_argument("--profile", help="report time per phase and per variable and bytes read per variable as JSON, on stderr or in each --batch record", action="store_true")
     args = parser.parse_args()
-    main(args.dataset, args.k)
+    if args.dap_cache or args.dap_cache_dir is not None:
+        args.dap_cache = args.dap_cache_dir or os.path.join(CACHE_DIR, 'dap')
+    else:
+        args.dap_cache = None
+    if args.cache or args.cache_file is not None:
+        args.cache = args.cache_file or os.path.join(CACHE_DIR, 'extents.sqlite')
+    else:
+        args.cache = None
+    if args.bounds or args.bounds_vertices is not None:
+        args.bounds = args.bounds_vertices or BOUNDS_MAX_VERTICES
+    else:
+        args.bounds = None
+
+    if args.incremental and not args.cache:
+        parser.error("--incremental requires --cache")
+    if args.read_workers and (args.batch or args.aggregate):
+        parser.error("--read-workers can't be combined with --batch or --aggregate; use --workers")
+    if args.batch and args.aggregate:
+        parser.error("--batch and --aggregate are exclusive")
+    if args.bounds and args.aggregate:
+        parser.error("--bounds can't be combined with --aggregate")
+    if args.profile and args.aggregate:
+        parser.error("--profile can't be combined with --aggregate")
+    cache = ExtentCache(args.cache, args.cache_max_size, args.cache_hash) if args.cache else None
+    if args.aggregate:
+        aggregate_main(args.aggregate, args.dataset, args.workers, args.k, args.header_only, args.dap_cache, cache, args.refresh, args.incremental, args.max_memory, args.approx)
+    elif args.batch:
+        batch_main(args.dataset, args.workers, args.k, args.header_only, args.dap_cache, cache, args.refresh, args.incremental, args.max_memory, args.approx, args.bounds, args.profile)
+    elif len(args.dataset) > 1:
+        parser.error("more than one dataset requires --batch or --aggregate")
+    else:
+        main(args.dataset[0], args.k, args.header_only, args.dap_cache, cache, args.refresh, args.incremental, args.read_workers, args.max_memory, args.approx, args.bounds, args.profile)
+    if cache is not None:
+        cache.close()
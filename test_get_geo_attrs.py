@@ -0,0 +1,149 @@
+"""
+Behaviour of collection aggregates (--aggregate): merging the partial
+reductions of files, unit conversion between them, and replacing and
+removing files. Also extents read from attributes (--header-only).
+
+Run with `python -m pytest test_get_geo_attrs.py`.
+"""
+
+import netCDF4
+import numpy as np
+import pytest
+
+import get_geo_attrs
+
+def write_profile(path, depths, units, days=(0.0, 1.0, 2.0)):
+    """
+    Write a small profile file with lat, lon, time and depth.
+    """
+
+    with netCDF4.Dataset(path, "w") as nc:
+        nc.createDimension("time", len(days))
+        nc.createDimension("depth", len(depths))
+        for name, var_units, values in (
+            ("time", "days since 2021-01-01", days),
+            ("lat", "degrees_north", np.linspace(10, 11, len(days))),
+            ("lon", "degrees_east", np.linspace(-80, -79, len(days)))
+        ):
+            v = nc.createVariable(name, "f8", ("time",))
+            v.units = var_units
+            v[:] = values
+        depth = nc.createVariable("depth", "f8", ("depth",))
+        depth.units = units
+        depth.standard_name = "depth"
+        depth.positive = "down"
+        depth[:] = depths
+    return str(path)
+
+def describe(path):
+    record = get_geo_attrs.describe_dataset(path, kwds=False)
+    assert record["error"] is None
+    return record
+
+def test_merge_partials():
+    a = {"min": 0.0, "max": 2.0, "count": 3, "diff_sum": 2.0, "diff_count": 2}
+    b = {"min": -1.0, "max": 1.0, "count": 2, "diff_sum": 2.0, "diff_count": 1}
+    merged = get_geo_attrs.merge_partials(a, b)
+    assert merged == {"min": -1.0, "max": 2.0, "count": 5, "diff_sum": 4.0, "diff_count": 3}
+    assert merged == get_geo_attrs.merge_partials(b, a)
+    assert get_geo_attrs.merge_partials(None, a) == a
+
+def test_merge_summaries_converts_units(tmp_path):
+    metres = get_geo_attrs.summarize_record(describe(write_profile(tmp_path / "m.nc", [0.0, 10.0, 20.0], "m")))
+    km = get_geo_attrs.summarize_record(describe(write_profile(tmp_path / "km.nc", [1.0, 2.0, 3.0], "km")))
+
+    merged = get_geo_attrs.merge_summaries(metres, km)["extents"]["vertical"]
+    assert merged["units"] == "m"
+    assert (merged["min"], merged["max"]) == (0.0, 3000.0)
+    # spacings of 10 m and 1 km, two of each
+    assert merged["diff_sum"] / merged["diff_count"] == pytest.approx(505.0)
+
+    merged = get_geo_attrs.merge_summaries(km, metres)["extents"]["vertical"]
+    assert merged["units"] == "km"
+    assert (merged["min"], merged["max"]) == (0.0, 3.0)
+
+def test_merge_summaries_rejects_unconvertible_units(tmp_path):
+    metres = get_geo_attrs.summarize_record(describe(write_profile(tmp_path / "m.nc", [0.0, 10.0], "m")))
+    other = get_geo_attrs.summarize_record(describe(write_profile(tmp_path / "m.nc", [0.0, 10.0], "m")))
+    other["extents"]["vertical"]["units"] = "fathoms"
+    with pytest.raises(ValueError):
+        get_geo_attrs.merge_summaries(metres, other)
+
+def test_aggregate_mixed_units(tmp_path):
+    aggregate = get_geo_attrs.CollectionAggregate(str(tmp_path / "agg.json"))
+    aggregate.add(describe(write_profile(tmp_path / "m.nc", [0.0, 10.0, 20.0], "m")))
+    aggregate.add(describe(write_profile(tmp_path / "km.nc", [1.0, 2.0, 3.0], "km")))
+    vertical = aggregate.record()["extents"]["vertical"]
+    assert (vertical["min"], vertical["max"], vertical["units"]) == (0.0, 3000.0, "m")
+
+def test_aggregate_rejects_file_leaving_state_unchanged(tmp_path):
+    aggregate = get_geo_attrs.CollectionAggregate(str(tmp_path / "agg.json"))
+    aggregate.add(describe(write_profile(tmp_path / "a.nc", [0.0, 10.0], "m")))
+    before = aggregate.record()
+
+    bad = describe(write_profile(tmp_path / "b.nc", [0.0, 10.0], "m"))
+    bad["extents"]["vertical"]["units"] = "fathoms"
+    with pytest.raises(ValueError):
+        aggregate.add(bad)
+    assert aggregate.record() == before
+    assert len(aggregate.files) == 1
+
+def test_aggregate_readding_a_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_profile(tmp_path / "a.nc", [0.0, 10.0, 20.0], "m")
+    write_profile(tmp_path / "b.nc", [0.0, 5.0], "m", days=(3.0, 4.0))
+
+    aggregate = get_geo_attrs.CollectionAggregate(str(tmp_path / "agg.json"))
+    aggregate.add(describe("a.nc"))
+    aggregate.add(describe("b.nc"))
+    once = aggregate.record()
+
+    # the same file under another name replaces it rather than counting twice
+    aggregate.add(describe("./a.nc"))
+    aggregate.add(describe(str(tmp_path / "b.nc")))
+    assert len(aggregate.files) == 2
+    assert aggregate.record() == once
+
+    # state survives a save and reload
+    aggregate.save()
+    reloaded = get_geo_attrs.CollectionAggregate(str(tmp_path / "agg.json"))
+    assert reloaded.record() == once
+
+def test_aggregate_replace_and_remove(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    aggregate = get_geo_attrs.CollectionAggregate(str(tmp_path / "agg.json"))
+    aggregate.add(describe(write_profile(tmp_path / "a.nc", [0.0, 10.0, 20.0], "m")))
+    aggregate.add(describe(write_profile(tmp_path / "b.nc", [0.0, 50.0], "m", days=(3.0, 4.0))))
+    assert aggregate.record()["extents"]["vertical"]["max"] == 50.0
+    assert aggregate.record()["time_coverage"]["end"] == "2021-01-05T00:00:00Z"
+
+    # a replaced file's old extents are dropped, not merged with the new
+    aggregate.add(describe(write_profile(tmp_path / "b.nc", [0.0, 5.0], "m", days=(3.0, 4.0))))
+    assert aggregate.record()["extents"]["vertical"]["max"] == 20.0
+
+    assert aggregate.remove("./b.nc")
+    assert not aggregate.remove("b.nc")
+    record = aggregate.record()
+    assert record["extents"]["vertical"]["max"] == 20.0
+    assert record["time_coverage"]["end"] == "2021-01-03T00:00:00Z"
+
+    assert aggregate.remove(str(tmp_path / "a.nc"))
+    assert aggregate.files == {}
+    assert aggregate.record()["extents"] == {}
+
+def test_header_extent_ignores_ranges_without_two_values(tmp_path):
+    with netCDF4.Dataset(tmp_path / "ranges.nc", "w") as nc:
+        nc.createDimension("x", 3)
+        for name, attrs in (
+            ("one", {"actual_range": np.array([5.0]), "valid_range": np.array([-90.0])}),
+            ("three", {"actual_range": np.array([1.0, 2.0, 3.0]), "valid_range": np.array([-1.0, 1.0])}),
+            ("two", {"actual_range": np.array([1.0, 3.0])})
+        ):
+            v = nc.createVariable(name, "f8", ("x",))
+            v.setncatts(attrs)
+
+        assert get_geo_attrs.header_extent(nc, nc["one"]) is None
+        acc = get_geo_attrs.header_extent(nc, nc["three"])
+        assert (acc.source, acc.min, acc.max) == ("valid_range", -1.0, 1.0)
+        acc = get_geo_attrs.header_extent(nc, nc["two"])
+        assert (acc.source, acc.min, acc.max) == ("actual_range", 1.0, 3.0)